@@ -0,0 +1,16 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_tweet_like_count"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tweets", sa.Column("like_count", sa.Integer, nullable=False, server_default="0"))
+    op.execute("UPDATE tweets SET like_count = (SELECT COUNT(*) FROM likes WHERE likes.tweet_id = tweets.id)")
+
+
+def downgrade() -> None:
+    op.drop_column("tweets", "like_count")
@@ -0,0 +1,22 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_timeline_entries"
+down_revision = "0002_tweet_like_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "timeline_entries",
+        sa.Column("owner_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("tweet_id", sa.Integer, sa.ForeignKey("tweets.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("author_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    )
+    op.create_index("ix_timeline_entries_owner_author", "timeline_entries", ["owner_id", "author_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_timeline_entries_owner_author", table_name="timeline_entries")
+    op.drop_table("timeline_entries")
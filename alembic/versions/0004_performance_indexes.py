@@ -0,0 +1,51 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_performance_indexes"
+down_revision = "0003_timeline_entries"
+branch_labels = None
+depends_on = None
+
+NOT_NULL_FOREIGN_KEYS = {
+    "follows": ("follower_id", "followee_id"),
+    "likes": ("user_id", "tweet_id"),
+    "tweet_medias": ("tweet_id", "media_id"),
+}
+
+
+def upgrade() -> None:
+    tweet_columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("tweets")}
+    if "created_at" not in tweet_columns:
+        with op.batch_alter_table("tweets") as batch:
+            batch.add_column(
+                sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+            )
+
+    for table, columns in NOT_NULL_FOREIGN_KEYS.items():
+        # 0001 allowed NULL keys; an association row missing either side links nothing, so it is dropped.
+        rows = sa.table(table, *(sa.column(column) for column in columns))
+        op.execute(rows.delete().where(sa.or_(*(rows.c[column].is_(None) for column in columns))))
+        with op.batch_alter_table(table) as batch:
+            for column in columns:
+                batch.alter_column(column, existing_type=sa.Integer, nullable=False)
+
+    op.create_index("ix_tweets_author_created", "tweets", ["author_id", "created_at"])
+    op.create_index("ix_tweets_popularity", "tweets", ["like_count", "created_at", "id"])
+    op.create_index("ix_likes_tweet_user", "likes", ["tweet_id", "user_id"])
+    op.create_index("ix_follows_followee_follower", "follows", ["followee_id", "follower_id"])
+    op.create_index("ix_tweet_medias_tweet_id", "tweet_medias", ["tweet_id"])
+    op.create_index("ix_medias_uploader_id", "medias", ["uploader_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_medias_uploader_id", table_name="medias")
+    op.drop_index("ix_tweet_medias_tweet_id", table_name="tweet_medias")
+    op.drop_index("ix_follows_followee_follower", table_name="follows")
+    op.drop_index("ix_likes_tweet_user", table_name="likes")
+    op.drop_index("ix_tweets_popularity", table_name="tweets")
+    op.drop_index("ix_tweets_author_created", table_name="tweets")
+
+    for table, columns in NOT_NULL_FOREIGN_KEYS.items():
+        with op.batch_alter_table(table) as batch:
+            for column in columns:
+                batch.alter_column(column, existing_type=sa.Integer, nullable=True)
@@ -0,0 +1,19 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_media_content_hash"
+down_revision = "0004_performance_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("medias") as batch:
+        batch.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+        batch.create_unique_constraint("uq_media_uploader_hash", ["uploader_id", "content_hash"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("medias") as batch:
+        batch.drop_constraint("uq_media_uploader_hash", type_="unique")
+        batch.drop_column("content_hash")
@@ -0,0 +1,16 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_media_variants"
+down_revision = "0005_media_content_hash"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("medias", sa.Column("variants", sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("medias") as batch:
+        batch.drop_column("variants")
@@ -0,0 +1,230 @@
+"""Response cache for read-heavy endpoints (feed pages, profiles).
+
+Entries are keyed on ``scope:user_id:g<generation>:<page>``. Writes never hunt down individual keys: they bump the
+affected users' generation counter, which orphans every cached page of that user at once (orphans age out by TTL or
+LRU eviction). Because the generation is read before a miss is computed, a write racing with the computation makes the
+stored entry unreachable instead of stale.
+
+Redis calls block, so they never run on the event loop: handlers go through ``lookup``/``store``, which hop to the
+threadpool for a blocking backend, and invalidations made by sync code running on the loop (``AsyncSession.run_sync``)
+are collected by ``deferring()`` and applied from the threadpool once that code returns.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+Invalidation = tuple[str, set[int]]
+
+_deferred: ContextVar[list[Invalidation] | None] = ContextVar("deferred_invalidations", default=None)
+
+
+class CacheBackend(Protocol):
+    blocking: bool
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+    def incr_many(self, keys: Iterable[str]) -> None: ...
+
+
+class MemoryBackend:
+    """Process-local LRU with per-entry expiry."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def incr_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Stores entries in Redis, so every worker shares hits and invalidations.
+
+    ``client`` is anything speaking the redis-py API subset ``get``/``set(ex=)``/``incr``/``pipeline``.
+    """
+
+    blocking = True
+
+    def __init__(self, client, prefix: str = "microblog:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def incr_many(self, keys: Iterable[str]) -> None:
+        """Bump many counters in one round trip; a post by a popular author touches every follower's feed."""
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(self.prefix + key)
+        pipe.execute()
+
+    def get_counter(self, key: str) -> int:
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+
+class ResponseCache:
+    def __init__(self, backend: MemoryBackend | RedisBackend | None, ttl: float) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, scope: str, user_id: int, page: str = "") -> str | None:
+        """The current key for a user's page, or ``None`` when caching is disabled."""
+        if self.backend is None:
+            return None
+        generation = self.backend.get_counter(f"gen:{scope}:{user_id}")
+        return f"{scope}:{user_id}:g{generation}:{page}"
+
+    def get(self, key: str | None) -> bytes | None:
+        if key is None:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str | None, value: bytes) -> None:
+        if key is not None:
+            self.backend.set(key, value, self.ttl)
+
+    async def lookup(self, scope: str, user_id: int, page: str = "") -> tuple[str | None, bytes | None]:
+        """The current key for a page and its cached body, without blocking the event loop."""
+        if self.backend is None:
+            return None, None
+        if self.backend.blocking:
+            return await run_in_threadpool(self._lookup, scope, user_id, page)
+        return self._lookup(scope, user_id, page)
+
+    async def store(self, key: str | None, value: bytes) -> None:
+        if key is None:
+            return
+        if self.backend.blocking:
+            await run_in_threadpool(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def _lookup(self, scope: str, user_id: int, page: str) -> tuple[str | None, bytes | None]:
+        key = self.key(scope, user_id, page)
+        return key, self.get(key)
+
+    def invalidate(self, scope: str, user_ids: Iterable[int]) -> None:
+        if self.backend is None:
+            return
+        deferred = _deferred.get()
+        if deferred is not None and self.backend.blocking:
+            deferred.append((scope, set(user_ids)))
+            return
+        self._bump(scope, user_ids)
+
+    def _bump(self, scope: str, user_ids: Iterable[int]) -> None:
+        keys = [f"gen:{scope}:{user_id}" for user_id in set(user_ids)]
+        if keys:
+            self.backend.incr_many(keys)
+
+    @contextmanager
+    def deferring(self) -> Iterator[list[Invalidation]]:
+        """Collect invalidations made in this context instead of applying them; see ``apply``."""
+        invalidations: list[Invalidation] = []
+        token = _deferred.set(invalidations)
+        try:
+            yield invalidations
+        finally:
+            _deferred.reset(token)
+
+    async def apply(self, invalidations: list[Invalidation]) -> None:
+        if invalidations:
+            await run_in_threadpool(self._apply, invalidations)
+
+    def _apply(self, invalidations: list[Invalidation]) -> None:
+        for scope, user_ids in invalidations:
+            self._bump(scope, user_ids)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+def _build_backend() -> MemoryBackend | RedisBackend | None:
+    if settings.response_cache_backend == "memory":
+        return MemoryBackend(settings.response_cache_max_entries)
+    if settings.response_cache_backend == "redis":
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(settings.redis_url))
+    return None
+
+
+response_cache = ResponseCache(_build_backend(), settings.response_cache_ttl_seconds)
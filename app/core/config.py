@@ -1,11 +1,81 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy.engine import make_url
+
+# Async driver used for each backend when ASYNC_DATABASE_URL is derived from DATABASE_URL.
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
 
 
 class Settings(BaseSettings):
     database_url: str = "postgresql+psycopg2://microblog:microblog@db:5432/microblog"
     app_debug: bool = False
+    # Serve requests through AsyncSession (asyncpg/aiosqlite) instead of a threadpool-bound Session.
+    db_async: bool = False
+    async_database_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    # Seconds before a pooled connection is replaced; -1 keeps connections forever.
+    db_pool_recycle: int = 1800
+    # True pings every connection on checkout; False relies on pool_recycle and reconnects after a failed statement.
+    db_pool_pre_ping: bool = True
+    admin_api_keys: list[str] = []
+    profile_follow_preview: int = 50
+    # Likers embedded per feed tweet; the rest are paged by GET /api/tweets/{id}/likes.
+    feed_sample_likers: int = 3
+    # Rows deleted per transaction by the admin account purge.
+    purge_chunk_size: int = 1000
+    # Items accepted by one batch write request; each batch is one transaction.
+    batch_max_items: int = 500
+    # Feed and profile response cache: "none", a per-process LRU ("memory") or a shared Redis ("redis").
+    response_cache_backend: Literal["none", "memory", "redis"] = "none"
+    response_cache_ttl_seconds: float = 30.0
+    response_cache_max_entries: int = 10_000
+    redis_url: str = "redis://localhost:6379/0"
+    media_max_bytes: int = 10 * 1024 * 1024
+    media_variants_enabled: bool = True
+    media_variant_workers: int = 2
+    media_variant_quality: int = 80
+    # "read" builds the feed from follows on every request, "write" materializes timelines when tweets are posted.
+    feed_fanout: Literal["read", "write"] = "read"
+    # Acknowledge likes once appended to LIKE_QUEUE_LOG and apply them in coalesced batches from a background thread.
+    like_write_behind: bool = False
+    like_queue_log: str = "data/like-queue.log"
+    like_queue_flush_interval: float = 0.5
+    like_queue_max_batch: int = 1000
+    # Past this many queued events a submit flushes synchronously, which bounds both memory and lag.
+    like_queue_max_pending: int = 50_000
+    like_queue_fsync: bool = True
+    # Count and time SQL per request, reported in the Server-Timing header and a debug log line.
+    server_timing: bool = True
+    # Record per-route request metrics and serve them at GET /metrics in the Prometheus text format.
+    metrics_enabled: bool = True
+    # Fraction of requests run under the sampling profiler; admins can also ask for one with X-Debug-Profile: 1.
+    profiler_sample_rate: float = 0.0
+    profiler_interval: float = 0.005
+    # Slowest profiles kept in memory for GET /api/admin/profiles.
+    profiler_keep: int = 20
+    # Raise LazyLoadError when a relationship is lazily loaded inside a request (meant for tests and development).
+    sql_strict_lazy_loads: bool = False
+    auth_cache_ttl_seconds: float = 60.0
+    auth_cache_max_entries: int = 10_000
 
     model_config = SettingsConfigDict(env_file=".env", env_prefix="", case_sensitive=False)
 
+    @property
+    def resolved_async_database_url(self) -> str:
+        """``ASYNC_DATABASE_URL``, else ``DATABASE_URL`` with its driver swapped for the backend's async driver."""
+        if self.async_database_url:
+            return self.async_database_url
+        url = make_url(self.database_url)
+        backend = url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError(
+                f"DB_ASYNC has no async driver for {backend!r} URLs; set ASYNC_DATABASE_URL "
+                f"(supported backends: {', '.join(ASYNC_DRIVERS)})"
+            )
+        return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
 
 settings = Settings()
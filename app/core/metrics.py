@@ -0,0 +1,130 @@
+"""In-process request metrics rendered in the Prometheus text exposition format.
+
+Observations are only made by ``MetricsMiddleware`` on the event loop thread, and ``/metrics`` is rendered on that same
+thread, so the registry uses plain dicts and ints without locks: recording a request is a few dict lookups and a
+``bisect``. Each worker process keeps its own registry; Prometheus aggregates across the scraped instances.
+
+Gauges that already live elsewhere (connection pools, the response cache) are read when ``render`` runs instead of
+being mirrored on every request.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[tuple[str, str], ...]
+Sample = tuple[str, Labels, float]
+Family = tuple[str, str, str, Iterable[Sample]]
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: Labels) -> Iterable[Sample]:
+        cumulative = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            cumulative += count
+            yield f"{name}_bucket", (*labels, ("le", _format_value(bound))), cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, cumulative
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.requests: dict[tuple[str, str, int], int] = {}
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.request_sizes: dict[tuple[str, str], Histogram] = {}
+        self.response_sizes: dict[tuple[str, str], Histogram] = {}
+        self.collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def observe(self, method: str, route: str, status: int, seconds: float, request_bytes: int, response_bytes: int):
+        key = (method, route)
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.request_sizes[key] = Histogram(SIZE_BUCKETS)
+            self.response_sizes[key] = Histogram(SIZE_BUCKETS)
+        latency.observe(seconds)
+        self.request_sizes[key].observe(request_bytes)
+        self.response_sizes[key].observe(response_bytes)
+        counter = (method, route, status)
+        self.requests[counter] = self.requests.get(counter, 0) + 1
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """Register ``fn`` yielding ``(name, type, help, samples)`` families, evaluated on every scrape."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        families: list[Family] = [
+            (
+                "http_requests_in_flight",
+                "gauge",
+                "Requests being served.",
+                [("http_requests_in_flight", (), self.in_flight)],
+            ),
+            (
+                "http_requests_total",
+                "counter",
+                "Requests by route template and status code.",
+                [
+                    ("http_requests_total", (("method", method), ("route", route), ("status", str(status))), count)
+                    for (method, route, status), count in self.requests.items()
+                ],
+            ),
+            *(
+                (name, "histogram", help_text, _histogram_samples(name, histograms))
+                for name, help_text, histograms in (
+                    ("http_request_duration_seconds", "Request latency by route template.", self.latency),
+                    ("http_request_size_bytes", "Request body size (Content-Length).", self.request_sizes),
+                    ("http_response_size_bytes", "Response body size.", self.response_sizes),
+                )
+            ),
+        ]
+        for collect in self.collectors:
+            families.extend(collect())
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_samples(name: str, histograms: dict[tuple[str, str], Histogram]) -> Iterable[Sample]:
+    for (method, route), histogram in histograms.items():
+        yield from histogram.samples(name, (("method", method), ("route", route)))
+
+
+_LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value.translate(_LABEL_ESCAPES)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float | str) -> str:
+    return value if isinstance(value, str) else repr(value)
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,156 @@
+"""ASGI middleware wrapped around the whole application."""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.profiler import Profile, activate, deactivate
+from app.db.instrumentation import install_query_hooks, track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Counts and times the SQL issued by each HTTP request.
+
+    The totals go out as ``Server-Timing: db;dur=<ms>;desc="<n> queries", app;dur=<ms>`` (browser devtools show it
+    next to the request) and as a debug log line. With ``settings.sql_strict_lazy_loads`` a lazy relationship load
+    inside the request raises ``LazyLoadError``.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        install_query_hooks()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.server_timing:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with track_queries(strict=settings.sql_strict_lazy_loads) as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    elapsed = (time.perf_counter() - started) * 1000
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'db;dur={stats.seconds * 1000:.2f};desc="{stats.statements} queries", app;dur={elapsed:.2f}',
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+        logger.debug(
+            "%s %s: %d SQL statements in %.2f ms, %d lazy loads, %.2f ms total",
+            scope["method"],
+            scope["path"],
+            stats.statements,
+            stats.seconds * 1000,
+            stats.lazy_loads,
+            (time.perf_counter() - started) * 1000,
+        )
+
+
+def _route_template(scope: Scope) -> str:
+    """The matched route's path template, so ``/api/tweets/1`` and ``/api/tweets/2`` share one series."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app_root_path = scope.get("app_root_path")
+    if app_root_path is not None and scope["root_path"] != app_root_path:
+        return scope["root_path"][len(app_root_path) :] + "/{path}"  # a mounted app such as /media
+    return "unmatched"
+
+
+def _content_length(scope: Scope) -> int:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            return int(value) if value.isdigit() else 0
+    return 0
+
+
+class MetricsMiddleware:
+    """Records latency, status, payload sizes and in-flight requests per route template into ``metrics``."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500  # an exception escaping the app becomes a 500 further out
+        response_bytes = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe(
+                scope["method"],
+                _route_template(scope),
+                status,
+                time.perf_counter() - started,
+                _content_length(scope),
+                response_bytes,
+            )
+
+
+def _profile_requested(scope: Scope) -> bool:
+    """``X-Debug-Profile: 1`` from a caller whose ``api-key`` is an admin key."""
+    requested, api_key = False, b""
+    for name, value in scope["headers"]:
+        if name == b"x-debug-profile":
+            requested = value == b"1"
+        elif name == b"api-key":
+            api_key = value
+    return requested and api_key.decode("latin-1") in settings.admin_api_keys
+
+
+class ProfilerMiddleware:
+    """Runs a sampled fraction of requests, and admin-requested ones, under ``app.core.profiler``."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (
+            (settings.profiler_sample_rate and random.random() < settings.profiler_sample_rate)
+            or _profile_requested(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"])
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        token = activate(profile)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.route = _route_template(scope)
+            deactivate(profile, token)
@@ -0,0 +1,188 @@
+"""Opt-in statistical profiler for individual requests.
+
+A profiled request registers the threads doing its work: the event loop thread for the whole request, and each
+threadpool worker for as long as it runs one of the request's ``Database.run`` calls (see ``bind_thread``). A single
+background thread wakes every ``interval`` seconds while any profile is active, grabs ``sys._current_frames()`` and
+counts the collapsed stack of every registered thread. Nothing is traced, so the profiled request runs at full speed
+and other requests pay only a ``ContextVar.get`` per database call.
+
+Samples of the event loop thread include whatever other coroutines happened to run there; worker samples belong to
+the profiled request alone. Finished profiles compete for ``keep`` slots and only the slowest survive. Stacks are
+rendered in the collapsed format (``frame;frame;frame count``) read by flamegraph.pl, speedscope and inferno.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import wraps
+from types import FrameType
+from typing import Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+@dataclass(eq=False)
+class Profile:
+    method: str
+    path: str
+    route: str = ""
+    status: int = 0
+    duration_ms: float = 0.0
+    samples: int = 0
+    id: int = 0
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    stacks: Counter[str] = field(default_factory=Counter)
+    threads: dict[int, str] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": self.samples,
+            "started_at": self.started_at,
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_current: ContextVar[Profile | None] = ContextVar("profile", default=None)
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+
+def _collapse(frame: FrameType | None, root: str) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Samples the registered threads of all active profiles from one daemon thread."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._active: set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            while True:
+                frames = sys._current_frames()
+                with self._lock:
+                    if not self._active:
+                        self._wake.clear()
+                        break
+                    for profile in self._active:
+                        for thread_id, role in list(profile.threads.items()):
+                            frame = frames.get(thread_id)
+                            if frame is not None:
+                                profile.stacks[_collapse(frame, role)] += 1
+                                profile.samples += 1
+                del frames
+                time.sleep(self.interval)
+
+
+class ProfileStore:
+    """Keeps the ``keep`` slowest finished profiles."""
+
+    def __init__(self, keep: int) -> None:
+        self.keep = keep
+        self._heap: list[tuple[float, int, Profile]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            profile.id = next(self._ids)
+            entry = (profile.duration_ms, profile.id, profile)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, entry)
+            elif self._heap and entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> list[Profile]:
+        with self._lock:
+            return [profile for _, _, profile in sorted(self._heap, reverse=True)]
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            return next((profile for _, pid, profile in self._heap if pid == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+sampler = Sampler(settings.profiler_interval)
+profile_store = ProfileStore(settings.profiler_keep)
+
+
+def current_profile() -> Profile | None:
+    return _current.get()
+
+
+def activate(profile: Profile) -> object:
+    """Start sampling ``profile`` on the calling (event loop) thread; returns the token for ``deactivate``."""
+    profile.threads[threading.get_ident()] = "event-loop"
+    sampler.start(profile)
+    return _current.set(profile)
+
+
+def deactivate(profile: Profile, token) -> None:
+    sampler.stop(profile)
+    _current.reset(token)
+    profile_store.add(profile)
+
+
+def bind_thread(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap ``fn`` so the worker thread running it is sampled into the current profile, if there is one."""
+    profile = _current.get()
+    if profile is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args, **kwargs) -> T:
+        thread_id = threading.get_ident()
+        profile.threads[thread_id] = "worker"
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.threads.pop(thread_id, None)
+
+    return run
@@ -0,0 +1,23 @@
+"""Pre-encoded JSON responses.
+
+Hot endpoints build plain dicts/lists and encode them once with orjson, skipping Pydantic model construction and
+FastAPI's ``jsonable_encoder`` pass. The bytes can be cached and replayed as-is.
+"""
+
+from __future__ import annotations
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+
+def _fallback(value):
+    return jsonable_encoder(value)
+
+
+def encode_json(payload) -> bytes:
+    return orjson.dumps(payload, default=_fallback)
+
+
+def json_bytes_response(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
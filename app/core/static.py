@@ -0,0 +1,215 @@
+"""Static file serving tuned for the SPA bundle and uploaded media.
+
+* content-hashed files (``chunk-vendors.398321e0.js``, ``<sha256>.png``) are sent with ``Cache-Control: immutable``;
+* pre-built ``.br``/``.gz`` siblings are served when the client accepts them (``python -m app.core.static dist``
+  builds them);
+* single ``Range`` requests are answered with ``206`` so media can be resumed and seeked;
+* ``index.html`` is held in memory and revalidated by ETag.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+from email.utils import formatdate
+from mimetypes import guess_type
+from pathlib import Path
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# A hex digest of 8+ chars as its own dot-separated segment or as the whole stem: app.ee2cdef2.js, <sha256>.thumb.webp
+_HASHED_NAME_RE = re.compile(r"(^|\.)[0-9a-f]{8,}\.")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Preferred order when the client accepts several encodings.
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".svg", ".json", ".txt", ".ico"}
+
+
+def is_content_hashed(name: str) -> bool:
+    return bool(_HASHED_NAME_RE.search(name))
+
+
+def _accepted_encodings(request_headers: Headers) -> set[str]:
+    accepted = set()
+    for part in request_headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(token.lower())
+    return accepted
+
+
+class _FileRangeResponse(FileResponse):
+    """A FileResponse that only sends bytes ``start..end`` (inclusive) of the file."""
+
+    def __init__(self, path: str | os.PathLike, start: int, end: int, size: int, **kwargs) -> None:
+        super().__init__(path, status_code=206, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, precompressed: bool = True, ranges: bool = False, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.precompressed = precompressed
+        self.ranges = ranges
+        # (path, mtime) -> {encoding: (sibling path, stat)}; bundles are immutable, so a lookup is done once per file.
+        self._siblings: dict[tuple[str, float], dict[str, tuple[str, os.stat_result]]] = {}
+
+    def _compressed_siblings(self, full_path: str, stat_result: os.stat_result) -> dict:
+        key = (full_path, stat_result.st_mtime)
+        siblings = self._siblings.get(key)
+        if siblings is None:
+            siblings = {}
+            for encoding, suffix in _ENCODINGS:
+                try:
+                    siblings[encoding] = (full_path + suffix, os.stat(full_path + suffix))
+                except OSError:
+                    continue
+            self._siblings[key] = siblings
+        return siblings
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = os.fspath(full_path)
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL if is_content_hashed(name) else REVALIDATE_CACHE_CONTROL,
+        }
+
+        if self.precompressed:
+            siblings = self._compressed_siblings(full_path, stat_result)
+            if siblings:
+                headers["vary"] = "Accept-Encoding"
+                accepted = _accepted_encodings(request_headers)
+                for encoding, _ in _ENCODINGS:
+                    if encoding in accepted and encoding in siblings:
+                        sibling_path, sibling_stat = siblings[encoding]
+                        headers["content-encoding"] = encoding
+                        response = FileResponse(
+                            sibling_path,
+                            status_code=status_code,
+                            stat_result=sibling_stat,
+                            media_type=guess_type(name)[0] or "text/plain",
+                            headers=headers,
+                        )
+                        if self.is_not_modified(response.headers, request_headers):
+                            return NotModifiedResponse(response.headers)
+                        return response
+
+        if self.ranges:
+            headers["accept-ranges"] = "bytes"
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if self.ranges and "range" in request_headers:
+            return self._range_response(full_path, stat_result, request_headers, response)
+        return response
+
+    def _range_response(
+        self, full_path: str, stat_result: os.stat_result, request_headers: Headers, full: FileResponse
+    ) -> Response:
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range not in (full.headers["etag"], full.headers["last-modified"]):
+            return full
+
+        size = stat_result.st_size
+        match = _RANGE_RE.match(request_headers["range"].strip())
+        if match is None:
+            # Multiple or malformed ranges: the full body is a valid answer.
+            return full
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return full
+        if start > end or start >= size:
+            return Response(status_code=416, headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes"})
+
+        headers = {key: value for key, value in full.headers.items() if key not in ("content-length", "content-type")}
+        return _FileRangeResponse(full_path, start, end, size, headers=headers, media_type=full.media_type)
+
+
+class CachedIndexHtml:
+    """Serves the SPA shell from memory with an ETag, so deep links never hit the disk."""
+
+    def __init__(self, path: Path) -> None:
+        self.body = path.read_bytes()
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        self.etag = f'"{hashlib.md5(self.body, usedforsecurity=False).hexdigest()}"'
+        self.last_modified = formatdate(path.stat().st_mtime, usegmt=True)
+
+    def response(self, request: Request) -> Response:
+        headers = {
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "cache-control": REVALIDATE_CACHE_CONTROL,
+            "vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.etag in [tag.strip(" W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if "gzip" in _accepted_encodings(request.headers):
+            return Response(self.gzipped, media_type="text/html", headers={**headers, "content-encoding": "gzip"})
+        return Response(self.body, media_type="text/html", headers=headers)
+
+
+def precompress(directory: Path, min_size: int = 1024) -> int:
+    """Write ``.gz`` (and ``.br`` when brotli is installed) next to every compressible file; returns files written."""
+    written = 0
+    for path in directory.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES or path.stat().st_size < min_size:
+            continue
+        data = path.read_bytes()
+        outputs = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            outputs[".br"] = brotli.compress(data, quality=11)
+        for suffix, compressed in outputs.items():
+            if len(compressed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build precompressed siblings for static assets.")
+    parser.add_argument("directory", type=Path, nargs="?", default=Path("dist"))
+    args = parser.parse_args()
+    print(f"{precompress(args.directory)} compressed files written")
@@ -4,3 +4,4 @@ from app.models.media import Media  # noqa
 from app.models.tweet import Tweet, TweetMedia  # noqa
 from app.models.like import Like  # noqa
 from app.models.follow import Follow  # noqa
+from app.models.timeline import TimelineEntry  # noqa
@@ -0,0 +1,93 @@
+"""Per-request SQL statement accounting and lazy-load detection.
+
+``track_queries()`` binds a ``QueryStats`` to the current context; engine events then count and time every cursor
+execution made while it is active. Request work reaches the database through ``run_in_threadpool`` or
+``AsyncSession.run_sync``, both of which run in a copy of the caller's context, so statements issued there land in the
+request's stats. Outside a tracked block the hooks cost one ``ContextVar.get``.
+
+Lazy loads are counted as well, and with ``strict=True`` they raise ``LazyLoadError`` instead of silently turning a
+serializer loop into N+1 queries.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+
+class LazyLoadError(RuntimeError):
+    """A relationship was lazily loaded while strict lazy-load checking was on."""
+
+
+@dataclass(slots=True)
+class QueryStats:
+    statements: int = 0
+    seconds: float = 0.0
+    lazy_loads: int = 0
+    strict: bool = False
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(strict: bool = False) -> Iterator[QueryStats]:
+    stats = QueryStats(strict=strict)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _record(info: dict) -> None:
+    stats = _current.get()
+    started = info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - started.pop()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    _record(conn.info)
+
+
+def _handle_error(context) -> None:
+    # A failed statement never reaches after_cursor_execute; still count it and drop its start time.
+    if context.connection is not None:
+        _record(context.connection.info)
+
+
+def _check_lazy_load(state: ORMExecuteState) -> None:
+    stats = _current.get()
+    if stats is None or not state.is_select or state.lazy_loaded_from is None:
+        return
+    stats.lazy_loads += 1
+    if stats.strict:
+        raise LazyLoadError(f"lazy load of {state.loader_strategy_path.natural_path[-1]} inside a request")
+
+
+def install_query_hooks() -> None:
+    """Listen on every engine and session; idempotent, so test engines created later are covered too."""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    event.listen(Session, "do_orm_execute", _check_lazy_load)
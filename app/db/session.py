@@ -1,10 +1,53 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.core.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+def _engine_options(url: str, poolclass) -> dict:
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if make_url(url).get_backend_name() == "sqlite":
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def enforce_sqlite_foreign_keys(engine: Engine) -> None:
+    """SQLite ignores ``ON DELETE CASCADE`` unless every connection opts in; deletes rely on it (passive_deletes)."""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _enable_foreign_keys)
+
+
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url, InstrumentedQueuePool))
+enforce_sqlite_foreign_keys(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = (
+    create_async_engine(
+        settings.resolved_async_database_url,
+        **_engine_options(settings.resolved_async_database_url, InstrumentedAsyncQueuePool),
+    )
+    if settings.db_async
+    else None
+)
+if async_engine is not None:
+    enforce_sqlite_foreign_keys(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, autocommit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,38 @@
+"""Dialect-aware single-statement writes."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import Insert, Select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+
+def _insert(db: Session, table: Any) -> tuple[Insert, bool]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(), True
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(), True
+    return insert(table), False
+
+
+def insert_ignore(db: Session, table: Any, columns: list[str], rows: Select, returning: Any) -> list[Row]:
+    """``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING``; returns the rows actually inserted.
+
+    Rows are inserted only if ``rows`` selects them (so existence checks live in its ``WHERE``) and no unique
+    constraint rejects them, in one round trip. Dialects without ``ON CONFLICT`` run a plain insert in a savepoint and
+    treat an ``IntegrityError`` as a conflict of the whole statement.
+    """
+    stmt, ignores_conflicts = _insert(db, table)
+    stmt = stmt.from_select(columns, rows).returning(returning)
+    if ignores_conflicts:
+        return db.execute(stmt).all()
+    try:
+        with db.begin_nested():
+            return db.execute(stmt).all()
+    except IntegrityError:
+        return []
@@ -1,19 +1,171 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
 from fastapi import Depends, Header, HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.profiler import bind_thread
+from app.db.session import AsyncSessionLocal, SessionLocal
 from app.models.user import User
 
 
-def get_db():
-    db = SessionLocal()
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated caller, detached from any session."""
+
+    id: int
+    name: str
+
+
+class PrincipalCache:
+    """Bounded LRU of api_key -> Principal whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[api_key]
+                return None
+            self._entries.move_to_end(api_key)
+            return principal
+
+    def put(self, api_key: str, principal: Principal) -> None:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[api_key] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, api_key: str) -> None:
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            stale = [key for key, (_, principal) in self._entries.items() if principal.id == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+
+
+@event.listens_for(User.api_key, "set")
+def _invalidate_rotated_key(target: User, value, oldvalue, initiator) -> None:
+    if isinstance(oldvalue, str) and oldvalue != value:
+        principal_cache.invalidate(oldvalue)
+
+
+@event.listens_for(User.name, "set")
+def _invalidate_renamed_user(target: User, value, oldvalue, initiator) -> None:
+    if target.id is not None and oldvalue != value:
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User) -> None:
+    principal_cache.invalidate(target.api_key)
+
+
+T = TypeVar("T")
+
+
+class Database:
+    """Runs synchronous, session-bound work without blocking the event loop.
+
+    Route logic is written once against a plain ``Session``. With a sync session it runs in the threadpool; with an
+    ``AsyncSession`` it runs through ``run_sync`` on the event loop, so no worker thread is held during I/O.
+    The session is only created on the first ``run``, so requests answered without the database never touch the pool.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session | AsyncSession]) -> None:
+        self._session_factory = session_factory
+        self._session: Session | AsyncSession | None = None
+
+    @property
+    def session(self) -> Session | AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        session = self.session
+        if isinstance(session, AsyncSession):
+            # fn runs on the event loop here, so blocking cache invalidations wait until it has returned.
+            with response_cache.deferring() as invalidations:
+                try:
+                    return await session.run_sync(fn, *args, **kwargs)
+                finally:
+                    await response_cache.apply(invalidations)
+        return await run_in_threadpool(bind_thread(fn), session, *args, **kwargs)
+
+    def fork(self) -> Database:
+        """A fresh runner on the same session factory, for work that outlives the request (background tasks)."""
+        return Database(self._session_factory)
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is None:
+            return
+        if isinstance(session, AsyncSession):
+            await session.close()
+        else:
+            await run_in_threadpool(session.close)
+
+
+async def get_database():
+    db = Database(AsyncSessionLocal if settings.db_async else SessionLocal)
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+def _load_principal(db: Session, api_key: str) -> Principal | None:
+    row = db.query(User.id, User.name).filter(User.api_key == api_key).first()
+    return Principal(id=row.id, name=row.name) if row else None
+
+
+async def get_current_user(
+    api_key: str = Header(..., alias="api-key"), db: Database = Depends(get_database)
+) -> Principal:
+    principal = principal_cache.get(api_key)
+    if principal is None:
+        principal = await db.run(_load_principal, api_key)
+        if principal is None:
+            raise HTTPException(status_code=401, detail="invalid api key")
+        principal_cache.put(api_key, principal)
+    return principal
 
 
-async def get_current_user(api_key: str = Header(..., alias="api-key"), db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.api_key == api_key).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="invalid api key")
+async def get_admin_user(
+    api_key: str = Header(..., alias="api-key"), user: Principal = Depends(get_current_user)
+) -> Principal:
+    if api_key not in settings.admin_api_keys:
+        raise HTTPException(status_code=403, detail="admin access required")
     return user
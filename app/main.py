@@ -4,19 +4,29 @@ from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 
+from app.core.middleware import MetricsMiddleware, ProfilerMiddleware, ServerTimingMiddleware
+from app.core.static import CachedIndexHtml, CachedStaticFiles
+from app.routers.admin import router as admin_router
+from app.routers.metrics import router as metrics_router
 from app.routers.users import router as users_router
 from app.routers.medias import router as medias_router
 from app.routers.tweets import router as tweets_router
 from app.db.session import SessionLocal
 from app.seed import seed_demo_data
+from app.services.like_queue import like_queue, write_behind
+from app.services.media_variants import shutdown_executor
 
 app = FastAPI(title="Microblog API", version="0.1.0")
 app.include_router(users_router)
 app.include_router(medias_router)
 app.include_router(tweets_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilerMiddleware)
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +63,23 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("shutdown")
+def stop_media_workers() -> None:
+    shutdown_executor()
+
+
+@app.on_event("startup")
+def start_like_queue() -> None:
+    if write_behind():
+        like_queue.start()
+
+
+@app.on_event("shutdown")
+def flush_like_queue() -> None:
+    if write_behind():
+        like_queue.stop()
+
+
 if os.getenv("APP_SKIP_BOOTSTRAP") != "1":
 
     @app.on_event("startup")
@@ -63,25 +90,26 @@ if os.getenv("APP_SKIP_BOOTSTRAP") != "1":
 
 MEDIA_DIR = Path("media")
 MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+app.mount("/media", CachedStaticFiles(directory=MEDIA_DIR, precompressed=False, ranges=True), name="media")
 
 DIST_DIR = Path("dist")
 assets_dir = DIST_DIR / "assets"
 index_path = DIST_DIR / "index.html"
 
 if assets_dir.is_dir():
-    app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
+    app.mount("/assets", CachedStaticFiles(directory=assets_dir), name="assets")
 
 for subdir in ("css", "js"):
     candidate = DIST_DIR / subdir
     if candidate.is_dir():
-        app.mount(f"/{subdir}", StaticFiles(directory=candidate), name=f"dist-{subdir}")
+        app.mount(f"/{subdir}", CachedStaticFiles(directory=candidate), name=f"dist-{subdir}")
 
 if index_path.exists():
+    index_html = CachedIndexHtml(index_path)
 
     @app.get("/{full_path:path}")
     async def spa(full_path: str, request: Request):
-        return FileResponse(index_path)
+        return index_html.response(request)
 
 else:
 
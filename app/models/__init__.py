@@ -3,5 +3,6 @@ from app.models.media import Media  # noqa: F401
 from app.models.tweet import Tweet, TweetMedia  # noqa: F401
 from app.models.like import Like  # noqa: F401
 from app.models.follow import Follow  # noqa: F401
+from app.models.timeline import TimelineEntry  # noqa: F401
 
-__all__ = ["User", "Media", "Tweet", "TweetMedia", "Like", "Follow"]
+__all__ = ["User", "Media", "Tweet", "TweetMedia", "Like", "Follow", "TimelineEntry"]
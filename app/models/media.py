@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy import JSON, ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -8,10 +8,13 @@ from app.db.session import Base
 
 class Media(Base):
     __tablename__ = "medias"
+    __table_args__ = (UniqueConstraint("uploader_id", "content_hash", name="uq_media_uploader_hash"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     path: Mapped[str] = mapped_column(String(512), nullable=False)
-    uploader_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    variants: Mapped[dict[str, str] | None] = mapped_column(JSON, nullable=True)
+    uploader_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
 
     uploader: Mapped["User"] = relationship("User", back_populates="media_uploads")
     tweets: Mapped[list["Tweet"]] = relationship(
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -10,27 +10,40 @@ from app.db.session import Base
 
 class Tweet(Base):
     __tablename__ = "tweets"
+    __table_args__ = (
+        Index("ix_tweets_author_created", "author_id", "created_at"),
+        Index("ix_tweets_popularity", "like_count", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     content: Mapped[str] = mapped_column(String(1000), nullable=False)
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    like_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+    )
 
     author: Mapped["User"] = relationship("User", back_populates="tweets")
+    # Child rows go with the tweet through ON DELETE CASCADE; passive_deletes keeps the ORM from loading them first.
     tweet_medias: Mapped[list["TweetMedia"]] = relationship(
-        "TweetMedia", back_populates="tweet", cascade="all, delete-orphan"
+        "TweetMedia", back_populates="tweet", cascade="all, delete-orphan", passive_deletes=True
     )
     medias: Mapped[list["Media"]] = relationship(
         "Media", secondary="tweet_medias", back_populates="tweets", viewonly=True
     )
-    likes: Mapped[list["Like"]] = relationship("Like", back_populates="tweet", cascade="all, delete-orphan")
+    likes: Mapped[list["Like"]] = relationship(
+        "Like", back_populates="tweet", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class TweetMedia(Base):
     __tablename__ = "tweet_medias"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id", ondelete="CASCADE"))
+    tweet_id: Mapped[int] = mapped_column(ForeignKey("tweets.id", ondelete="CASCADE"), index=True)
     media_id: Mapped[int] = mapped_column(ForeignKey("medias.id", ondelete="CASCADE"))
 
     tweet: Mapped["Tweet"] = relationship("Tweet", back_populates="tweet_medias")
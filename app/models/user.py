@@ -9,7 +9,7 @@ from app.db.session import Base
 class User(Base):
     __tablename__ = "users"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     api_key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False, index=True)
 
@@ -17,16 +17,20 @@ class User(Base):
     media_uploads: Mapped[list["Media"]] = relationship(
         "Media", back_populates="uploader", cascade="all, delete-orphan"
     )
-    likes: Mapped[list["Like"]] = relationship("Like", back_populates="user", cascade="all, delete-orphan")
+    likes: Mapped[list["Like"]] = relationship(
+        "Like", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
     followers: Mapped[list["Follow"]] = relationship(
         "Follow",
         foreign_keys="Follow.followee_id",
         back_populates="followee",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     following: Mapped[list["Follow"]] = relationship(
         "Follow",
         foreign_keys="Follow.follower_id",
         back_populates="follower",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
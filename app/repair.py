@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models import Like, Tweet
+from app.services.timeline import rebuild_timelines
+
+
+def recount_like_counts(db: Session) -> int:
+    """Recompute the denormalized ``Tweet.like_count`` from the ``likes`` table.
+
+    Only rows whose counter drifted are rewritten; returns how many were fixed.
+    """
+    actual = select(func.count(Like.id)).where(Like.tweet_id == Tweet.id).scalar_subquery()
+    result = db.execute(update(Tweet).where(Tweet.like_count != actual).values(like_count=actual))
+    db.commit()
+    return result.rowcount
+
+
+COMMANDS = {
+    "like-counts": recount_like_counts,
+    "timelines": rebuild_timelines,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Recompute denormalized data.")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+
+    session = SessionLocal()
+    try:
+        fixed = COMMANDS[args.command](session)
+    finally:
+        session.close()
+    print(f"{args.command}: {fixed} rows repaired")
+
+
+if __name__ == "__main__":
+    main()
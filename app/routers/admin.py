@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import response_cache
+from app.core.profiler import profile_store
+from app.db import session as db_session
+from app.db.pool import pool_stats
+from app.deps.auth import Database, Principal, get_admin_user, get_database
+from app.services.like_queue import like_queue
+from app.services.purge import purge_user
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+@router.get("/pool")
+async def connection_pool(admin: Principal = Depends(get_admin_user)):
+    pools = {"sync": pool_stats(db_session.engine.pool)}
+    if db_session.async_engine is not None:
+        pools["async"] = pool_stats(db_session.async_engine.pool)
+    return {"result": True, "pools": pools}
+
+
+@router.get("/cache")
+async def cache_stats(admin: Principal = Depends(get_admin_user)):
+    return {"result": True, "cache": response_cache.stats()}
+
+
+@router.get("/likes")
+async def like_queue_stats(admin: Principal = Depends(get_admin_user)):
+    return {"result": True, "queue": like_queue.stats()}
+
+
+@router.get("/profiles")
+async def slowest_profiles(admin: Principal = Depends(get_admin_user)):
+    return {"result": True, "profiles": [profile.summary() for profile in profile_store.slowest()]}
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def profile_stacks(profile_id: int, admin: Principal = Depends(get_admin_user)):
+    """Collapsed stacks (``frame;frame count`` per line) for flamegraph.pl, speedscope or inferno."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="profile not found")
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.delete("/users/{user_id}")
+async def purge_account(user_id: int, admin: Principal = Depends(get_admin_user), db: Database = Depends(get_database)):
+    purged = await db.run(purge_user, user_id)
+    if purged is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
+    return {"result": True, "purged": purged}
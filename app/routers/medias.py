@@ -1,28 +1,241 @@
+import hashlib
+import os
+import re
+import uuid
 from pathlib import Path
+from typing import BinaryIO
 
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.deps.auth import get_current_user, get_db
+from app.core.config import settings
+from app.deps.auth import Database, Principal, get_current_user, get_database
 from app.models.media import Media
+from app.services import media_variants
 
 router = APIRouter(prefix="/api", tags=["medias"])
 MEDIA_DIR = Path("media")
+_SUFFIX_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
 
 
-@router.post("/medias")
-async def upload_media(file: UploadFile = File(...), db: Session = Depends(get_db), user=Depends(get_current_user)):
-    MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-    original_name = Path(file.filename or "upload").name
-    dest = MEDIA_DIR / original_name
-    i = 1
-    while dest.exists():
-        dest = MEDIA_DIR / f"{i}_{original_name}"
-        i += 1
-    content = await file.read()
-    dest.write_bytes(content)
-    m = Media(path=f"/media/{dest.name}", uploader_id=user.id)
+# Multipart boundaries and part headers on top of the file itself.
+FORM_OVERHEAD = 16 * 1024
+
+_UPLOAD_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="file is too large")
+
+
+class _UploadSink:
+    """Receives multipart parser callbacks and spools the ``file`` part into MEDIA_DIR while hashing it.
+
+    Parser callbacks only queue data; ``drain`` does the blocking write and is run in the threadpool after each
+    received chunk. The size limit is checked as data arrives, so an oversized upload is cut off mid-stream.
+    """
+
+    def __init__(self) -> None:
+        self.filename: str | None = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.partial = MEDIA_DIR / f".upload-{uuid.uuid4().hex}.part"
+        self._out: BinaryIO | None = None
+        self._pending: list[bytes] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self) -> None:
+        self._disposition = b""
+
+    def _header_field_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._in_file = options.get(b"name") == b"file" and self.filename is None
+        if self._in_file:
+            self.filename = options.get(b"filename", b"upload").decode("utf-8", "replace") or "upload"
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > settings.media_max_bytes:
+            raise _too_large()
+        self._pending.append(data[start:end])
+
+    def _part_end(self) -> None:
+        self._in_file = False
+
+    def drain(self) -> None:
+        if self.filename is None:
+            return
+        if self._out is None:
+            # Opened as soon as the file part starts, so an empty file still yields a (zero-byte) upload.
+            MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+            self._out = self.partial.open("wb")
+        for chunk in self._pending:
+            self.digest.update(chunk)
+            self._out.write(chunk)
+        self._pending.clear()
+
+    def close(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def discard(self) -> None:
+        self.close()
+        self.partial.unlink(missing_ok=True)
+
+    @property
+    def suffix(self) -> str:
+        suffix = Path(self.filename or "").suffix.lower()
+        return suffix if _SUFFIX_RE.match(suffix) else ""
+
+
+async def _receive_upload(request: Request) -> _UploadSink:
+    """Stream the request body through the multipart parser without buffering it in memory or a temp file."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.media_max_bytes + FORM_OVERHEAD:
+        raise _too_large()
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise _missing_file()
+
+    sink = _UploadSink()
+    parser = MultipartParser(options[b"boundary"], sink.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await run_in_threadpool(sink.drain)
+        parser.finalize()
+        await run_in_threadpool(sink.drain)
+    except BaseException:
+        await run_in_threadpool(sink.discard)
+        raise
+    sink.close()
+    if sink.filename is None:
+        await run_in_threadpool(sink.discard)
+        raise _missing_file()
+    return sink
+
+
+def _missing_file() -> RequestValidationError:
+    return RequestValidationError([{"loc": ("body", "file"), "msg": "Field required", "type": "missing"}])
+
+
+@router.post("/medias", openapi_extra=_UPLOAD_SCHEMA)
+async def upload_media(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
+):
+    sink = await _receive_upload(request)
+    content_hash = sink.digest.hexdigest()
+    own, shared_path = await db.run(_find_media, content_hash, user)
+    if own is not None:
+        await run_in_threadpool(sink.discard)
+        media_id, has_variants, path = own.id, bool(own.variants), own.path
+    else:
+        if shared_path is None:
+            shared_path = await run_in_threadpool(_place_upload, sink.partial, f"{content_hash}{sink.suffix}")
+        else:
+            await run_in_threadpool(sink.discard)
+        media_id, has_variants, path = await db.run(_record_media, shared_path, content_hash, user)
+        if path != shared_path:
+            # A concurrent identical upload by the same user won the insert; drop our copy unless it is referenced.
+            await db.run(_remove_unreferenced, shared_path)
+    if not has_variants and media_variants.variants_enabled():
+        background_tasks.add_task(media_variants.build_variants, db, media_id, MEDIA_DIR / Path(path).name)
+    return {"result": True, "media_id": media_id}
+
+
+def _place_upload(partial: Path, name: str) -> str:
+    """Move a finished upload to its content-addressed name; an existing file with that name is kept."""
+    dest = MEDIA_DIR / name
+    if dest.exists():
+        partial.unlink()
+    else:
+        os.replace(partial, dest)
+    return f"/media/{name}"
+
+
+def _find_media(db: Session, content_hash: str, user: Principal):
+    """The caller's own row for this content, else the path any other row already stores it under."""
+    own = (
+        db.query(Media.id, Media.variants, Media.path)
+        .filter(Media.uploader_id == user.id, Media.content_hash == content_hash)
+        .first()
+    )
+    if own is not None:
+        return own, own.path
+    return None, db.query(Media.path).filter(Media.content_hash == content_hash).limit(1).scalar()
+
+
+def _remove_unreferenced(db: Session, path: str) -> None:
+    if db.query(Media.id).filter(Media.path == path).first() is None:
+        (MEDIA_DIR / Path(path).name).unlink(missing_ok=True)
+
+
+def _record_media(db: Session, path: str, content_hash: str, user: Principal) -> tuple[int, bool, str]:
+    existing = (
+        db.query(Media.id, Media.variants, Media.path)
+        .filter(Media.uploader_id == user.id, Media.content_hash == content_hash)
+        .first()
+    )
+    if existing:
+        return existing.id, bool(existing.variants), existing.path
+    m = Media(path=path, content_hash=content_hash, uploader_id=user.id)
     db.add(m)
-    db.commit()
-    db.refresh(m)
-    return {"result": True, "media_id": m.id}
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = (
+            db.query(Media.id, Media.variants, Media.path)
+            .filter(Media.uploader_id == user.id, Media.content_hash == content_hash)
+            .one()
+        )
+        return existing.id, bool(existing.variants), existing.path
+    return m.id, False, path
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, metrics
+from app.db import session as db_session
+from app.db.pool import pool_stats
+
+router = APIRouter(tags=["metrics"])
+
+# pool_stats key -> (metric, type, help)
+_POOL_METRICS = {
+    "size": ("db_pool_size", "gauge", "Configured pool size."),
+    "checked_out": ("db_pool_checked_out", "gauge", "Connections currently in use."),
+    "overflow": ("db_pool_overflow", "gauge", "Connections open beyond the pool size."),
+    "checkouts": ("db_pool_checkouts_total", "counter", "Successful connection checkouts."),
+    "checkout_timeouts": ("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out waiting."),
+    "wait_seconds_total": ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a free connection."),
+}
+
+
+@metrics.collector
+def _pool_metrics():
+    pools = {"sync": pool_stats(db_session.engine.pool)}
+    if db_session.async_engine is not None:
+        pools["async"] = pool_stats(db_session.async_engine.pool)
+    for key, (name, kind, help_text) in _POOL_METRICS.items():
+        samples = [(name, (("pool", pool),), stats[key]) for pool, stats in pools.items() if key in stats]
+        if samples:
+            yield name, kind, help_text, samples
+
+
+# response_cache.stats() key -> (metric, type, help)
+_CACHE_METRICS = {
+    "hits": ("response_cache_hits_total", "counter", "Response cache hits."),
+    "misses": ("response_cache_misses_total", "counter", "Response cache misses."),
+    "entries": ("response_cache_entries", "gauge", "Entries held by the in-process cache."),
+}
+
+
+@metrics.collector
+def _cache_metrics():
+    if not response_cache.enabled:
+        return
+    stats = response_cache.stats()
+    for key, (name, kind, help_text) in _CACHE_METRICS.items():
+        if key in stats:
+            yield name, kind, help_text, [(name, (), stats[key])]
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="metrics are disabled")
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
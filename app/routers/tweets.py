@@ -1,45 +1,76 @@
+import base64
+import binascii
+import json
 from datetime import datetime
 from typing import Iterable
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import case, delete, insert, literal, select, update
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 
-from app.deps.auth import get_current_user, get_db
-from app.models.follow import Follow
+from app.core.cache import response_cache
+from app.core.serialization import encode_json, json_bytes_response
+from app.db.statements import insert_ignore
+from app.deps.auth import Database, Principal, get_current_user, get_database
 from app.models.like import Like
 from app.models.media import Media
 from app.models.tweet import Tweet, TweetMedia
-from app.schemas.tweet import LikeInfo, TweetCreate, TweetOut
-from app.schemas.user import UserBrief
+from app.schemas.tweet import TweetBatchCreate, TweetCreate, TweetIdBatch
+from app.services import timeline
+from app.services.feed import invalidate_feeds_of, invalidate_liker_feeds, load_feed_page, load_likers_page
+from app.services.like_queue import like_queue, write_behind
 
 router = APIRouter(prefix="/api/tweets", tags=["tweets"])
 
 
-def _serialize_tweet(tweet: Tweet) -> dict:
-    attachments = [media.path for media in tweet.medias]
-    like_users = [LikeInfo(user_id=like.user_id, name=like.user.name if like.user else "") for like in tweet.likes]
-    payload = TweetOut(
-        id=tweet.id,
-        content=tweet.content,
-        attachments=attachments,
-        author=UserBrief.model_validate(tweet.author),
-        likes=like_users,
-        stamp=tweet.created_at,
-    )
-    return payload.model_dump()
+MAX_TWEET_LENGTH = 1000
+
+
+def _tweet_text(payload: TweetCreate) -> tuple[str, str | None]:
+    """The stripped tweet text and why it is rejected, if it is."""
+    text = (payload.tweet_data or "").strip()
+    if not text:
+        return text, "tweet_data is required"
+    if len(text) > MAX_TWEET_LENGTH:
+        return text, "tweet_data is too long"
+    return text, None
+
+
+def _encode_cursor(like_count: int, created_at: datetime, tweet_id: int) -> str:
+    raw = json.dumps([like_count, created_at.isoformat(), tweet_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# Cursor values are bound as BIGINT parameters; anything outside that range is never a cursor we issued.
+_BIGINT_MIN, _BIGINT_MAX = -(2**63), 2**63 - 1
+
+
+def _decode_cursor(cursor: str) -> tuple[int, datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        like_count, created_at, tweet_id = json.loads(raw)
+        like_count, created_at, tweet_id = int(like_count), datetime.fromisoformat(created_at), int(tweet_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, OverflowError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="invalid cursor")
+    if not (_BIGINT_MIN <= like_count <= _BIGINT_MAX and _BIGINT_MIN <= tweet_id <= _BIGINT_MAX):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="invalid cursor")
+    return like_count, created_at, tweet_id
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
-def create_tweet(
+async def create_tweet(
     payload: TweetCreate,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
 ):
-    text = (payload.tweet_data or "").strip()
-    if not text:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="tweet_data is required")
-    if len(text) > 1000:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="tweet_data is too long")
+    return await db.run(_create_tweet, payload, user)
+
+
+def _create_tweet(db: Session, payload: TweetCreate, user: Principal) -> dict:
+    text, error = _tweet_text(payload)
+    if error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=error)
 
     tweet = Tweet(content=text, author_id=user.id)
     db.add(tweet)
@@ -59,86 +90,234 @@ def create_tweet(
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="cannot attach foreign media")
             db.add(TweetMedia(tweet_id=tweet.id, media_id=media.id))
 
+    if timeline.fanout_on_write():
+        timeline.fan_out_tweet(db, tweet.id, user.id)
     db.commit()
+    invalidate_feeds_of(db, user.id)
     return {"result": True, "tweet_id": tweet.id}
 
 
+# Batch routes are declared before the ``/{tweet_id}`` ones so that "batch" is never parsed as a tweet id.
+@router.post("/batch")
+async def create_tweets(
+    batch: TweetBatchCreate,
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
+):
+    return await db.run(_create_tweets, batch, user)
+
+
+def _create_tweets(db: Session, batch: TweetBatchCreate, user: Principal) -> dict:
+    """Validate every item with one media lookup, then insert the valid ones with multi-row inserts."""
+    media_ids = {media_id for item in batch.tweets for media_id in item.tweet_media_ids or []}
+    uploaders = dict(db.execute(select(Media.id, Media.uploader_id).where(Media.id.in_(media_ids))).all())
+
+    results: list[dict | None] = []
+    accepted: list[tuple[int, str, list[int]]] = []
+    for index, item in enumerate(batch.tweets):
+        text, error = _tweet_text(item)
+        item_media = list(dict.fromkeys(item.tweet_media_ids or []))
+        if error is None and any(media_id not in uploaders for media_id in item_media):
+            error = "invalid media ids"
+        if error is None and any(uploaders[media_id] != user.id for media_id in item_media):
+            error = "cannot attach foreign media"
+        if error:
+            results.append({"result": False, "error_message": error})
+        else:
+            results.append(None)
+            accepted.append((index, text, item_media))
+
+    if accepted:
+        tweet_ids = (
+            db.execute(
+                insert(Tweet).returning(Tweet.id, sort_by_parameter_order=True),
+                [{"content": text, "author_id": user.id} for _, text, _ in accepted],
+            )
+            .scalars()
+            .all()
+        )
+        links = [
+            {"tweet_id": tweet_id, "media_id": media_id}
+            for tweet_id, (_, _, item_media) in zip(tweet_ids, accepted)
+            for media_id in item_media
+        ]
+        if links:
+            db.execute(insert(TweetMedia), links)
+        if timeline.fanout_on_write():
+            timeline.fan_out_tweets(db, tweet_ids)
+        db.commit()
+        invalidate_feeds_of(db, user.id)
+        for tweet_id, (index, _, _) in zip(tweet_ids, accepted):
+            results[index] = {"result": True, "tweet_id": tweet_id}
+    return {"result": True, "tweets": results}
+
+
+@router.post("/batch/likes")
+async def like_tweets(
+    batch: TweetIdBatch,
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
+):
+    return await db.run(_like_tweets, batch, user)
+
+
+def _like_tweets(db: Session, batch: TweetIdBatch, user: Principal) -> dict:
+    tweet_ids = list(dict.fromkeys(batch.tweet_ids))
+    inserted = insert_ignore(
+        db,
+        Like,
+        ["user_id", "tweet_id"],
+        select(literal(user.id), Tweet.id).where(Tweet.id.in_(tweet_ids)),
+        returning=Like.tweet_id,
+    )
+    liked = {row.tweet_id for row in inserted}
+    if liked:
+        db.execute(update(Tweet).where(Tweet.id.in_(liked)).values(like_count=Tweet.like_count + 1))
+        db.commit()
+        invalidate_liker_feeds(user.id)
+
+    unchanged = [tweet_id for tweet_id in tweet_ids if tweet_id not in liked]
+    existing = set(db.execute(select(Tweet.id).where(Tweet.id.in_(unchanged))).scalars()) if unchanged else set()
+    results = []
+    for tweet_id in tweet_ids:
+        if tweet_id in liked:
+            results.append({"tweet_id": tweet_id, "result": True, "message": "liked"})
+        elif tweet_id in existing:
+            results.append({"tweet_id": tweet_id, "result": True, "message": "already_liked"})
+        else:
+            results.append({"tweet_id": tweet_id, "result": False, "error_message": "tweet not found"})
+    return {"result": True, "likes": results}
+
+
 @router.delete("/{tweet_id}")
-def delete_tweet(
+async def delete_tweet(
     tweet_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
 ):
-    tweet = db.query(Tweet).filter(Tweet.id == tweet_id).first()
-    if not tweet:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="tweet not found")
-    if tweet.author_id != user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="not allowed to delete tweet")
+    return await db.run(_delete_tweet, tweet_id, user)
 
-    db.delete(tweet)
+
+def _delete_tweet(db: Session, tweet_id: int, user: Principal) -> dict:
+    # Likes, attachments and timeline entries go with the row through ON DELETE CASCADE.
+    deleted = db.execute(
+        delete(Tweet)
+        .where(Tweet.id == tweet_id, Tweet.author_id == user.id)
+        .returning(Tweet.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if deleted is None:
+        if not db.query(Tweet.id).filter(Tweet.id == tweet_id).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="tweet not found")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="not allowed to delete tweet")
     db.commit()
+    invalidate_feeds_of(db, user.id)
     return {"result": True}
 
 
 @router.post("/{tweet_id}/likes")
-def like_tweet(
+async def like_tweet(
     tweet_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
 ):
-    tweet = db.query(Tweet).options(selectinload(Tweet.likes)).filter(Tweet.id == tweet_id).first()
-    if not tweet:
+    if write_behind():
+        return await _submit_like(db, tweet_id, user, True)
+    return await db.run(_like_tweet, tweet_id, user)
+
+
+async def _submit_like(db: Database, tweet_id: int, user: Principal, liked: bool) -> dict:
+    """Write-behind path: the write is queued; likes keep the synchronous path's 404, unlikes stay idempotent."""
+    if liked and not await db.run(_tweet_exists, tweet_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="tweet not found")
+    await run_in_threadpool(like_queue.submit, user.id, tweet_id, liked)
+    return {"result": True}
 
-    already_liked = any(like.user_id == user.id for like in tweet.likes)
-    if not already_liked:
-        db.add(Like(user_id=user.id, tweet_id=tweet_id))
-        db.commit()
+
+def _tweet_exists(db: Session, tweet_id: int) -> bool:
+    return db.query(Tweet.id).filter(Tweet.id == tweet_id).first() is not None
+
+
+def _like_tweet(db: Session, tweet_id: int, user: Principal) -> dict:
+    inserted = insert_ignore(
+        db,
+        Like,
+        ["user_id", "tweet_id"],
+        select(literal(user.id), Tweet.id).where(Tweet.id == tweet_id),
+        returning=Like.id,
+    )
+    if not inserted:
+        if not db.query(Tweet.id).filter(Tweet.id == tweet_id).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="tweet not found")
+        return {"result": True}
+    db.execute(update(Tweet).where(Tweet.id == tweet_id).values(like_count=Tweet.like_count + 1))
+    db.commit()
+    invalidate_liker_feeds(user.id)
     return {"result": True}
 
 
 @router.delete("/{tweet_id}/likes")
-def unlike_tweet(
+async def unlike_tweet(
     tweet_id: int,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
 ):
-    like = db.query(Like).filter(Like.tweet_id == tweet_id, Like.user_id == user.id).first()
-    if not like:
+    if write_behind():
+        return await _submit_like(db, tweet_id, user, False)
+    return await db.run(_unlike_tweet, tweet_id, user)
+
+
+def _unlike_tweet(db: Session, tweet_id: int, user: Principal) -> dict:
+    removed = db.execute(
+        delete(Like).where(Like.tweet_id == tweet_id, Like.user_id == user.id).returning(Like.id)
+    ).first()
+    if removed is None:
         return {"result": True}
-    db.delete(like)
+    db.execute(
+        update(Tweet)
+        .where(Tweet.id == tweet_id)
+        .values(like_count=case((Tweet.like_count > 0, Tweet.like_count - 1), else_=0))
+    )
     db.commit()
+    invalidate_liker_feeds(user.id)
     return {"result": True}
 
 
+@router.get("/{tweet_id}/likes")
+async def list_likes(
+    tweet_id: int,
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    after_id: int | None = Query(None),
+):
+    return await db.run(_list_likes, tweet_id, limit, after_id)
+
+
+def _list_likes(db: Session, tweet_id: int, limit: int, after_id: int | None) -> dict:
+    if not db.query(Tweet.id).filter(Tweet.id == tweet_id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="tweet not found")
+    likes, next_after_id = load_likers_page(db, tweet_id, limit, after_id)
+    return {"result": True, "likes": likes, "next_after_id": next_after_id}
+
+
 @router.get("")
-def feed(
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+async def feed(
+    db: Database = Depends(get_database),
+    user: Principal = Depends(get_current_user),
     offset: int | None = Query(None),
     limit: int | None = Query(None),
+    cursor: str | None = Query(None),
 ):
-    author_ids = {row.followee_id for row in db.query(Follow.followee_id).filter(Follow.follower_id == user.id)}
-    author_ids.add(user.id)
-
-    tweets = (
-        db.query(Tweet)
-        .filter(Tweet.author_id.in_(author_ids))
-        .options(
-            selectinload(Tweet.author),
-            selectinload(Tweet.medias),
-            selectinload(Tweet.likes).joinedload(Like.user),
-        )
-        .all()
-    )
-
-    tweets.sort(key=lambda t: (len(t.likes), t.created_at or datetime.min, t.id), reverse=True)
+    cache_key, body = await response_cache.lookup("feed", user.id, f"{offset}:{limit}:{cursor}")
+    if body is None:
+        body = encode_json(await db.run(_feed, user, offset, limit, cursor))
+        await response_cache.store(cache_key, body)
+    return json_bytes_response(body)
 
-    if limit and limit > 0:
-        skip = 0
-        if offset:
-            skip = max(offset - 1, 0) * limit
-        tweets = tweets[skip : skip + limit]
 
-    payload = [_serialize_tweet(tweet) for tweet in tweets]
-    return {"result": True, "tweets": payload}
+def _feed(db: Session, user: Principal, offset: int | None, limit: int | None, cursor: str | None) -> dict:
+    after = _decode_cursor(cursor) if cursor else None
+    tweets, last_key = load_feed_page(db, user.id, offset, limit, after)
+    next_cursor = _encode_cursor(*last_key) if limit and limit > 0 and len(tweets) == limit else None
+    return {"result": True, "tweets": tweets, "next_cursor": next_cursor}
@@ -1,136 +1,255 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Literal
 
-from app.deps.auth import get_current_user, get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, exists, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.cache import response_cache
+from app.core.serialization import encode_json, json_bytes_response
+from app.db.statements import insert_ignore
+from app.deps.auth import Database, Principal, get_current_user, get_database
 from app.models.follow import Follow
 from app.models.user import User
-from app.schemas.user import UserBrief, UserListItem, UserProfile
+from app.schemas.user import UserBrief, UserIdBatch, UserListItem, UserProfile
+from app.services import timeline
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
-def _load_user_with_relations(db: Session, user_id: int) -> User | None:
-    return (
-        db.query(User)
-        .options(
-            selectinload(User.followers).joinedload(Follow.follower),
-            selectinload(User.following).joinedload(Follow.followee),
+def _follow_page(
+    db: Session, user_id: int, direction: Literal["followers", "following"], limit: int, after_id: int | None = None
+) -> tuple[list[dict], int | None]:
+    """One keyset page (by follow id) of a user's followers or followees, touching only that direction."""
+    if direction == "followers":
+        own_side, other_side = Follow.followee_id, Follow.follower_id
+    else:
+        own_side, other_side = Follow.follower_id, Follow.followee_id
+    query = db.query(Follow.id.label("follow_id"), User.id, User.name).join(User, User.id == other_side)
+    query = query.filter(own_side == user_id)
+    if after_id is not None:
+        query = query.filter(Follow.id > after_id)
+    rows = query.order_by(Follow.id).limit(limit).all()
+    users = [UserBrief(id=row.id, name=row.name).model_dump() for row in rows]
+    return users, rows[-1].follow_id if len(rows) == limit else None
+
+
+def _load_profile(db: Session, user_id: int) -> dict:
+    followers_count = select(func.count(Follow.id)).where(Follow.followee_id == User.id).scalar_subquery()
+    following_count = select(func.count(Follow.id)).where(Follow.follower_id == User.id).scalar_subquery()
+    user = (
+        db.query(
+            User.id,
+            User.name,
+            followers_count.label("followers_count"),
+            following_count.label("following_count"),
         )
         .filter(User.id == user_id)
         .first()
     )
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
 
-
-def _serialize_profile(user: User) -> dict:
+    preview = settings.profile_follow_preview
+    followers, _ = _follow_page(db, user_id, "followers", preview) if user.followers_count else ([], None)
+    following, _ = _follow_page(db, user_id, "following", preview) if user.following_count else ([], None)
     profile = UserProfile(
         id=user.id,
         name=user.name,
-        followers=[UserBrief.model_validate(link.follower) for link in user.followers if link.follower is not None],
-        following=[UserBrief.model_validate(link.followee) for link in user.following if link.followee is not None],
+        followers=followers,
+        following=following,
+        followers_count=user.followers_count,
+        following_count=user.following_count,
     )
     return profile.model_dump()
 
 
+def _invalidate_follow_pair(follower_id: int, followee_id: int) -> None:
+    response_cache.invalidate("feed", [follower_id])
+    response_cache.invalidate("profile", [follower_id, followee_id])
+
+
 @router.get("/me")
-def me(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    hydrated = _load_user_with_relations(db, user.id)
-    if hydrated is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
-    return {"result": True, "user": _serialize_profile(hydrated)}
+async def me(user: Principal = Depends(get_current_user), db: Database = Depends(get_database)):
+    return await _cached_profile(db, user.id)
 
 
 @router.get("")
-def list_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def list_users(
+    db: Database = Depends(get_database),
+    current_user: Principal = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    after_id: int | None = Query(None),
+    q: str | None = Query(None, max_length=255),
 ):
-    users = (
-        db.query(User)
-        .options(
-            selectinload(User.followers).joinedload(Follow.follower),
-            selectinload(User.following).joinedload(Follow.followee),
-        )
-        .all()
+    return await db.run(_list_users, current_user, limit, after_id, q)
+
+
+def _list_users(db: Session, current_user: Principal, limit: int, after_id: int | None, q: str | None) -> dict:
+    followers_count = select(func.count(Follow.id)).where(Follow.followee_id == User.id).scalar_subquery()
+    following_count = select(func.count(Follow.id)).where(Follow.follower_id == User.id).scalar_subquery()
+    is_following = exists().where(Follow.follower_id == current_user.id, Follow.followee_id == User.id)
+
+    query = db.query(
+        User.id,
+        User.name,
+        followers_count.label("followers_count"),
+        following_count.label("following_count"),
+        is_following.label("is_following"),
     )
-    items = []
-    for user in users:
-        followers = user.followers or []
-        following = user.following or []
-        is_following = any(link.follower_id == current_user.id for link in followers)
-        items.append(
-            UserListItem(
-                id=user.id,
-                name=user.name,
-                is_me=user.id == current_user.id,
-                is_following=is_following,
-                followers_count=len(followers),
-                following_count=len(following),
-            ).model_dump()
-        )
-    return {"result": True, "users": items}
+    if q:
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(User.name.ilike(f"{escaped}%", escape="\\"))
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    rows = query.order_by(User.id).limit(limit).all()
+
+    items = [
+        UserListItem(
+            id=row.id,
+            name=row.name,
+            is_me=row.id == current_user.id,
+            is_following=bool(row.is_following),
+            followers_count=row.followers_count,
+            following_count=row.following_count,
+        ).model_dump()
+        for row in rows
+    ]
+    next_after_id = rows[-1].id if len(rows) == limit else None
+    return {"result": True, "users": items, "next_after_id": next_after_id}
+
+
+# Declared before the ``/{user_id}`` routes so that "batch" is never parsed as a user id.
+@router.post("/batch/follow")
+async def follow_users(
+    batch: UserIdBatch,
+    db: Database = Depends(get_database),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await db.run(_follow_users, batch, current_user)
+
+
+def _follow_users(db: Session, batch: UserIdBatch, current_user: Principal) -> dict:
+    user_ids = list(dict.fromkeys(batch.user_ids))
+    inserted = insert_ignore(
+        db,
+        Follow,
+        ["follower_id", "followee_id"],
+        select(literal(current_user.id), User.id).where(User.id.in_(user_ids), User.id != current_user.id),
+        returning=Follow.followee_id,
+    )
+    followed = {row.followee_id for row in inserted}
+    if followed:
+        if timeline.fanout_on_write():
+            timeline.backfill_authors(db, current_user.id, list(followed))
+        db.commit()
+        response_cache.invalidate("feed", [current_user.id])
+        response_cache.invalidate("profile", [current_user.id, *followed])
+
+    unchanged = [user_id for user_id in user_ids if user_id not in followed]
+    existing = set(db.execute(select(User.id).where(User.id.in_(unchanged))).scalars()) if unchanged else set()
+    results = []
+    for user_id in user_ids:
+        if user_id == current_user.id:
+            results.append({"user_id": user_id, "result": False, "error_message": "cannot follow yourself"})
+        elif user_id in followed:
+            results.append({"user_id": user_id, "result": True, "message": "followed"})
+        elif user_id in existing:
+            results.append({"user_id": user_id, "result": True, "message": "already_following"})
+        else:
+            results.append({"user_id": user_id, "result": False, "error_message": "user not found"})
+    return {"result": True, "follows": results}
 
 
 @router.get("/{user_id}")
-def user_profile(user_id: int, db: Session = Depends(get_db)):
-    user = _load_user_with_relations(db, user_id)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
-    return {"result": True, "user": _serialize_profile(user)}
+async def user_profile(user_id: int, db: Database = Depends(get_database)):
+    return await _cached_profile(db, user_id)
+
+
+async def _cached_profile(db: Database, user_id: int):
+    cache_key, body = await response_cache.lookup("profile", user_id)
+    if body is None:
+        body = encode_json({"result": True, "user": await db.run(_load_profile, user_id)})
+        await response_cache.store(cache_key, body)
+    return json_bytes_response(body)
 
 
 @router.post("/{user_id}/follow")
-def follow_user(
+async def follow_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Database = Depends(get_database),
+    current_user: Principal = Depends(get_current_user),
 ):
+    return await db.run(_follow_user, user_id, current_user)
+
+
+def _follow_user(db: Session, user_id: int, current_user: Principal) -> dict:
     if user_id == current_user.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cannot follow yourself")
-    target = db.query(User).filter(User.id == user_id).first()
-    if not target:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
-
-    already_following = (
-        db.query(Follow).filter(Follow.follower_id == current_user.id, Follow.followee_id == user_id).first()
+    inserted = insert_ignore(
+        db,
+        Follow,
+        ["follower_id", "followee_id"],
+        select(literal(current_user.id), User.id).where(User.id == user_id),
+        returning=Follow.id,
     )
-    if not already_following:
-        db.add(Follow(follower_id=current_user.id, followee_id=user_id))
-        db.commit()
-        return {"result": True, "message": "followed"}
-    return {"result": True, "message": "already_following"}
+    if not inserted:
+        if not db.query(User.id).filter(User.id == user_id).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
+        return {"result": True, "message": "already_following"}
+    if timeline.fanout_on_write():
+        timeline.backfill_author(db, current_user.id, user_id)
+    db.commit()
+    _invalidate_follow_pair(current_user.id, user_id)
+    return {"result": True, "message": "followed"}
 
 
 @router.delete("/{user_id}/follow")
-def unfollow_user(
+async def unfollow_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Database = Depends(get_database),
+    current_user: Principal = Depends(get_current_user),
 ):
-    relation = db.query(Follow).filter(Follow.follower_id == current_user.id, Follow.followee_id == user_id).first()
-    if relation:
-        db.delete(relation)
-        db.commit()
-        return {"result": True, "message": "unfollowed"}
-    return {"result": True, "message": "not_following"}
+    return await db.run(_unfollow_user, user_id, current_user)
+
+
+def _unfollow_user(db: Session, user_id: int, current_user: Principal) -> dict:
+    removed = db.execute(
+        delete(Follow).where(Follow.follower_id == current_user.id, Follow.followee_id == user_id).returning(Follow.id)
+    ).first()
+    if removed is None:
+        return {"result": True, "message": "not_following"}
+    if timeline.fanout_on_write():
+        timeline.prune_author(db, current_user.id, user_id)
+    db.commit()
+    _invalidate_follow_pair(current_user.id, user_id)
+    return {"result": True, "message": "unfollowed"}
 
 
 @router.get("/{user_id}/followers")
-def list_followers(user_id: int, db: Session = Depends(get_db)):
-    user = _load_user_with_relations(db, user_id)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
-    followers = [
-        UserBrief.model_validate(link.follower).model_dump() for link in user.followers if link.follower is not None
-    ]
-    return {"result": True, "followers": followers}
+async def list_followers(
+    user_id: int,
+    db: Database = Depends(get_database),
+    limit: int = Query(100, ge=1, le=500),
+    after_id: int | None = Query(None),
+):
+    return await db.run(_list_follows, user_id, "followers", limit, after_id)
 
 
 @router.get("/{user_id}/following")
-def list_following(user_id: int, db: Session = Depends(get_db)):
-    user = _load_user_with_relations(db, user_id)
-    if not user:
+async def list_following(
+    user_id: int,
+    db: Database = Depends(get_database),
+    limit: int = Query(100, ge=1, le=500),
+    after_id: int | None = Query(None),
+):
+    return await db.run(_list_follows, user_id, "following", limit, after_id)
+
+
+def _list_follows(
+    db: Session, user_id: int, direction: Literal["followers", "following"], limit: int, after_id: int | None
+) -> dict:
+    if not db.query(User.id).filter(User.id == user_id).first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
-    following = [
-        UserBrief.model_validate(link.followee).model_dump() for link in user.following if link.followee is not None
-    ]
-    return {"result": True, "following": following}
+    users, next_after_id = _follow_page(db, user_id, direction, limit, after_id)
+    return {"result": True, direction: users, "next_after_id": next_after_id}
@@ -1,7 +1,8 @@
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
+from app.core.config import settings
 from app.schemas.user import UserBrief
 
 
@@ -10,6 +11,14 @@ class TweetCreate(BaseModel):
     tweet_media_ids: list[int] | None = None
 
 
+class TweetBatchCreate(BaseModel):
+    tweets: list[TweetCreate] = Field(..., min_length=1, max_length=settings.batch_max_items)
+
+
+class TweetIdBatch(BaseModel):
+    tweet_ids: list[int] = Field(..., min_length=1, max_length=settings.batch_max_items)
+
+
 class LikeInfo(BaseModel):
     user_id: int
     name: str
@@ -19,8 +28,13 @@ class TweetOut(BaseModel):
     id: int
     content: str
     attachments: list[str]
+    # Per attachment, the URLs of its resized variants (e.g. "thumb", "medium", "webp"); empty until generated.
+    attachment_variants: list[dict[str, str]]
     author: UserBrief
+    # A bounded sample of likers (the caller first when they liked it); like_count is the total.
     likes: list[LikeInfo]
+    like_count: int
+    liked_by_me: bool
     stamp: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.config import settings
 
 
 class UserBrief(BaseModel):
@@ -11,8 +13,11 @@ class UserBrief(BaseModel):
 class UserProfile(BaseModel):
     id: int
     name: str
+    # Bounded previews; the full lists are paginated by /api/users/{id}/followers and /following.
     followers: list[UserBrief]
     following: list[UserBrief]
+    followers_count: int
+    following_count: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -26,3 +31,7 @@ class UserListItem(BaseModel):
     following_count: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UserIdBatch(BaseModel):
+    user_ids: list[int] = Field(..., min_length=1, max_length=settings.batch_max_items)
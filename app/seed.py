@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import argparse
 import base64
+import csv
+import io
+import random
+import time
+from bisect import bisect
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Iterator
 
+from sqlalchemy import Table, bindparam, func, insert, select, text
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal
 from app.models import Follow, Like, Media, Tweet, TweetMedia, User
+from app.services import timeline
 
 USER_FIXTURES = [
     ("Cool Dev", "test"),
@@ -61,7 +73,9 @@ def seed_demo_data(db: Session) -> None:
     bob = users.get("bob")
     demo_viewer = users.get("test")
 
+    created_tweets = False
     if db.query(Tweet).count() == 0 and alice and bob:
+        created_tweets = True
         tweets = [
             Tweet(content="Добро пожаловать в корпоративный микроблог!", author_id=alice.id),
             Tweet(content="Мы теперь можем делиться новостями и идеями ⚡️", author_id=bob.id),
@@ -77,7 +91,10 @@ def seed_demo_data(db: Session) -> None:
                     Like(user_id=demo_viewer.id, tweet_id=tweets[1].id),
                 ]
             )
+            tweets[0].like_count += 1
+            tweets[1].like_count += 1
         db.add(Like(user_id=alice.id, tweet_id=tweets[1].id))
+        tweets[1].like_count += 1
 
         sample_path = ensure_sample_media()
         media = (
@@ -94,11 +111,271 @@ def seed_demo_data(db: Session) -> None:
             db.add(TweetMedia(tweet_id=tweets[0].id, media_id=media.id))
 
     db.commit()
+    if created_tweets and timeline.fanout_on_write():
+        timeline.rebuild_timelines(db)
 
 
-if __name__ == "__main__":
+class BulkWriter:
+    """Streams row tuples into a table: ``COPY ... FROM STDIN`` on psycopg2, chunked driver ``executemany`` elsewhere.
+
+    The executemany path compiles the ``INSERT`` once and hands plain tuples to the DBAPI cursor, applying only the
+    bind processors the column types need (e.g. datetimes on SQLite), so SQLAlchemy adds no per-row overhead.
+    """
+
+    def __init__(self, db: Session, chunk_size: int = 20_000) -> None:
+        self.db = db
+        self.chunk_size = chunk_size
+        self.dialect = db.get_bind().dialect
+        dbapi_connection = db.connection().connection.dbapi_connection
+        self.copy = self.dialect.name == "postgresql" and hasattr(dbapi_connection.cursor(), "copy_expert")
+
+    def write(self, table: Table, columns: list[str], rows: Iterable[tuple]) -> int:
+        if self.copy:
+
+            def write_chunk(chunk: list[tuple]) -> None:
+                self._copy(table, columns, chunk)
+
+        else:
+            write_chunk = self._executemany(table, columns)
+        written = 0
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            write_chunk(chunk)
+            written += len(chunk)
+        return written
+
+    def _executemany(self, table: Table, columns: list[str]):
+        compiled = insert(table).values({name: bindparam(name) for name in columns}).compile(dialect=self.dialect)
+        # Positional paramstyles bind in ``columns`` order, so row tuples pass through untouched.
+        positional = compiled.positional and list(compiled.positiontup) == columns
+        processors = [
+            (index, processor)
+            for index, name in enumerate(columns)
+            if (processor := table.c[name].type.dialect_impl(self.dialect).bind_processor(self.dialect))
+        ]
+
+        def write_chunk(chunk: list[tuple]) -> None:
+            if processors:
+                processed = [list(row) for row in chunk]
+                for row in processed:
+                    for index, processor in processors:
+                        row[index] = processor(row[index])
+                chunk = [tuple(row) for row in processed]
+            params = chunk if positional else [dict(zip(columns, row)) for row in chunk]
+            self.db.connection().exec_driver_sql(compiled.string, params)
+
+        return write_chunk
+
+    def _copy(self, table: Table, columns: list[str], chunk: list[tuple]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+        buffer.seek(0)
+        cursor = self.db.connection().connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+
+class ZipfSampler:
+    """Draws indexes ``0..n-1`` with probability proportional to ``1 / (index + 1) ** exponent``."""
+
+    def __init__(self, n: int, exponent: float, rng: random.Random) -> None:
+        self.rng = rng
+        self.cumulative = list(accumulate(1.0 / rank**exponent for rank in range(1, n + 1)))
+
+    def __call__(self) -> int:
+        return bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def _next_id(db: Session, model) -> int:
+    return (db.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+@contextmanager
+def _bulk_load_pragmas(db: Session) -> Iterator[None]:
+    """Relax SQLite's durability for a bulk load and restore the connection's settings afterwards."""
+    if db.get_bind().dialect.name != "sqlite":
+        yield
+        return
+    saved = {pragma: db.execute(text(f"PRAGMA {pragma}")).scalar() for pragma in ("synchronous", "cache_size")}
+    db.execute(text("PRAGMA synchronous=OFF"))
+    db.execute(text("PRAGMA cache_size=-262144"))
+    try:
+        yield
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        for pragma, value in saved.items():
+            db.execute(text(f"PRAGMA {pragma}={int(value)}"))
+
+
+# Share of likes that come from the author's followers; the rest go to popular accounts across the network.
+FOLLOWER_LIKE_SHARE = 0.8
+
+
+def generate_dataset(
+    db: Session,
+    users: int,
+    tweets: int,
+    avg_follows: float = 50.0,
+    avg_likes: float = 5.0,
+    media_ratio: float = 0.05,
+    days: int = 365,
+    seed: int = 0,
+    chunk_size: int = 20_000,
+) -> dict[str, int]:
+    """Append a synthetic, production-shaped dataset and return the number of rows written per table.
+
+    Follow targets and tweet authors are Zipf-distributed over a shuffled popularity ranking, so a few accounts have
+    most followers and most tweets; per-tweet like counts follow a Pareto tail with mean ``avg_likes``. Likers are
+    mostly the author's followers (``FOLLOWER_LIKE_SHARE``), otherwise Zipf-popular users, which keeps the locality
+    between the follow graph and likes that feed and liker queries see. Ids are assigned here rather than returned by
+    the database, which lets every table stream straight into ``BulkWriter``.
+    """
+    with _bulk_load_pragmas(db):
+        counts = _write_dataset(db, users, tweets, avg_follows, avg_likes, media_ratio, days, seed, chunk_size)
+    if timeline.fanout_on_write():
+        counts["timeline_entries"] = timeline.rebuild_timelines(db)
+    return counts
+
+
+def _write_dataset(
+    db: Session,
+    users: int,
+    tweets: int,
+    avg_follows: float,
+    avg_likes: float,
+    media_ratio: float,
+    days: int,
+    seed: int,
+    chunk_size: int,
+) -> dict[str, int]:
+    rng = random.Random(seed)
+    writer = BulkWriter(db, chunk_size)
+    first_user, first_tweet, first_media = _next_id(db, User), _next_id(db, Tweet), _next_id(db, Media)
+    user_ids = list(range(first_user, first_user + users))
+    popularity = user_ids[:]
+    rng.shuffle(popularity)
+    activity = user_ids[:]
+    rng.shuffle(activity)
+    popular_pick = ZipfSampler(users, 1.1, rng)
+    active_pick = ZipfSampler(users, 1.0, rng)
+    sample_path = f"/media/{ensure_sample_media().name}"
+    now = datetime.now(timezone.utc)
+    like_alpha = 1.5
+
+    counts = {
+        "users": writer.write(
+            User.__table__,
+            ["id", "name", "api_key"],
+            ((user_id, f"Synthetic {user_id}", f"synthetic-{seed}-{user_id}") for user_id in user_ids),
+        )
+    }
+
+    followers: dict[int, list[int]] = defaultdict(list)
+
+    def follows() -> Iterator[tuple[int, int]]:
+        for follower in user_ids:
+            wanted = min(users - 1, int(rng.paretovariate(2.0) * avg_follows / 2))
+            followees: set[int] = set()
+            for _ in range(wanted * 3):
+                if len(followees) >= wanted:
+                    break
+                followee = popularity[popular_pick()]
+                if followee != follower:
+                    followees.add(followee)
+            for followee in followees:
+                followers[followee].append(follower)
+                yield follower, followee
+
+    counts["follows"] = writer.write(Follow.__table__, ["follower_id", "followee_id"], follows())
+
+    likes: list[tuple[int, int]] = []
+    attachments: list[tuple[int, int, str, int]] = []
+
+    def tweet_rows() -> Iterator[tuple]:
+        for tweet_id in range(first_tweet, first_tweet + tweets):
+            author = activity[active_pick()]
+            wanted = min(users, int((rng.paretovariate(like_alpha) - 1) * avg_likes * (like_alpha - 1)))
+            audience = followers.get(author)
+            likers: set[int] = set()
+            for _ in range(wanted * 3):
+                if len(likers) >= wanted:
+                    break
+                if audience and rng.random() < FOLLOWER_LIKE_SHARE:
+                    likers.add(rng.choice(audience))
+                else:
+                    likers.add(popularity[popular_pick()])
+            like_count = len(likers)
+            likes.extend((liker, tweet_id) for liker in likers)
+            if rng.random() < media_ratio:
+                attachments.append((first_media + len(attachments), tweet_id, sample_path, author))
+            created_at = now - timedelta(seconds=rng.uniform(0, days * 86_400))
+            yield tweet_id, f"Synthetic tweet #{tweet_id}", author, like_count, created_at
+
+    tweet_columns = ["id", "content", "author_id", "like_count", "created_at"]
+    counts["tweets"] = counts["likes"] = counts["medias"] = 0
+    stream = tweet_rows()
+    while True:
+        # Likes and attachments are produced alongside their tweets; flush them per chunk to bound memory.
+        written = writer.write(Tweet.__table__, tweet_columns, islice(stream, chunk_size))
+        if not written:
+            break
+        counts["tweets"] += written
+        counts["likes"] += writer.write(Like.__table__, ["user_id", "tweet_id"], likes)
+        counts["medias"] += writer.write(
+            Media.__table__, ["id", "path", "uploader_id"], ((m, path, author) for m, _, path, author in attachments)
+        )
+        writer.write(TweetMedia.__table__, ["tweet_id", "media_id"], ((t, m) for m, t, _, _ in attachments))
+        first_media += len(attachments)
+        likes.clear()
+        attachments.clear()
+
+    if db.get_bind().dialect.name == "postgresql":
+        for table in ("users", "tweets", "medias"):
+            db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+    db.commit()
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Seed demo data, or append a synthetic dataset with --users/--tweets.")
+    parser.add_argument("--users", type=int, default=0, help="synthetic users to create")
+    parser.add_argument("--tweets", type=int, default=0, help="synthetic tweets to create")
+    parser.add_argument("--avg-follows", type=float, default=50.0)
+    parser.add_argument("--avg-likes", type=float, default=5.0)
+    parser.add_argument("--media-ratio", type=float, default=0.05, help="share of tweets with an attachment")
+    parser.add_argument("--days", type=int, default=365, help="spread tweet timestamps over this many days")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
     session = SessionLocal()
     try:
-        seed_demo_data(session)
+        if not args.users:
+            seed_demo_data(session)
+            return
+        started = time.perf_counter()
+        counts = generate_dataset(
+            session,
+            args.users,
+            args.tweets,
+            avg_follows=args.avg_follows,
+            avg_likes=args.avg_likes,
+            media_ratio=args.media_ratio,
+            days=args.days,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+        )
     finally:
         session.close()
+    summary = ", ".join(f"{table}={count}" for table, count in counts.items())
+    print(f"generated {summary} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
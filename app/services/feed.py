@@ -0,0 +1,213 @@
+"""Projection-based feed loading.
+
+The feed only needs a handful of columns per tweet, so it is read as plain rows rather than ``Tweet``/``User``/
+``Media``/``Like`` identities: no identity-map bookkeeping, no per-like ``User`` objects. On Postgres attachments and
+likers are folded into each row with ``json_agg``; other dialects fetch them with two column-only ``IN`` queries.
+
+Likers are only a sample (``settings.feed_sample_likers``, the viewer's own like first) next to ``like_count`` and
+``liked_by_me``, so a page's size does not grow with a tweet's popularity; the full list is paged by
+``GET /api/tweets/{id}/likes``.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import JSON, Select, case, cast, exists, func, literal, select, tuple_, type_coerce, union
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.models.follow import Follow
+from app.models.like import Like
+from app.models.media import Media
+from app.models.timeline import TimelineEntry
+from app.models.tweet import Tweet, TweetMedia
+from app.models.user import User
+from app.services import timeline
+
+FeedKey = tuple[int, datetime, int]
+
+
+def _page_query(user_id: int, offset: int | None, limit: int | None, after: FeedKey | None) -> Select:
+    query = select(
+        Tweet.id,
+        Tweet.content,
+        Tweet.created_at,
+        Tweet.like_count,
+        User.id.label("author_id"),
+        User.name.label("author_name"),
+        exists().where(Like.tweet_id == Tweet.id, Like.user_id == user_id).label("liked_by_me"),
+    ).join(User, User.id == Tweet.author_id)
+
+    if timeline.fanout_on_write():
+        query = query.join(TimelineEntry, TimelineEntry.tweet_id == Tweet.id).where(TimelineEntry.owner_id == user_id)
+    else:
+        author_ids = union(
+            select(Follow.followee_id).where(Follow.follower_id == user_id),
+            select(literal(user_id)),
+        )
+        query = query.where(Tweet.author_id.in_(author_ids))
+
+    if after is not None:
+        query = query.where(tuple_(Tweet.like_count, Tweet.created_at, Tweet.id) < tuple_(*after))
+    query = query.order_by(Tweet.like_count.desc(), Tweet.created_at.desc(), Tweet.id.desc())
+
+    if limit and limit > 0:
+        if offset and after is None:
+            query = query.offset(max(offset - 1, 0) * limit)
+        query = query.limit(limit)
+    return query
+
+
+def _sample_order(user_id: int):
+    """Sample likers ordered with the viewer first, then by like id."""
+    return case((Like.user_id == user_id, 0), else_=1)
+
+
+def _json_aggregates(query: Select, user_id: int, sample_size: int) -> Select:
+    attachments = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object("path", Media.path, "variants", Media.variants), TweetMedia.id
+                    )
+                ),
+                cast(literal("[]"), JSON),
+            )
+        )
+        .select_from(TweetMedia)
+        .join(Media, Media.id == TweetMedia.media_id)
+        .where(TweetMedia.tweet_id == Tweet.id)
+        .correlate(Tweet)
+        .scalar_subquery()
+    )
+    sample = (
+        select(Like.user_id, User.name, _sample_order(user_id).label("own_first"), Like.id.label("like_id"))
+        .join(User, User.id == Like.user_id)
+        .where(Like.tweet_id == Tweet.id)
+        .order_by(_sample_order(user_id), Like.id)
+        .limit(sample_size)
+        .correlate(Tweet)
+        .subquery()
+    )
+    likers = select(
+        func.coalesce(
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object("user_id", sample.c.user_id, "name", sample.c.name),
+                    sample.c.own_first,
+                    sample.c.like_id,
+                )
+            ),
+            cast(literal("[]"), JSON),
+        )
+    ).scalar_subquery()
+    return query.add_columns(
+        type_coerce(attachments, JSON).label("attachments"), type_coerce(likers, JSON).label("likers")
+    )
+
+
+def _attachments_by_tweet(db: Session, tweet_ids: Sequence[int]) -> dict[int, list[dict]]:
+    rows = db.execute(
+        select(TweetMedia.tweet_id, Media.path, Media.variants)
+        .join(Media, Media.id == TweetMedia.media_id)
+        .where(TweetMedia.tweet_id.in_(tweet_ids))
+        .order_by(TweetMedia.id)
+    )
+    grouped: dict[int, list[dict]] = defaultdict(list)
+    for tweet_id, path, variants in rows:
+        grouped[tweet_id].append({"path": path, "variants": variants})
+    return grouped
+
+
+def _likers_by_tweet(db: Session, tweet_ids: Sequence[int], user_id: int, sample_size: int) -> dict[int, list[dict]]:
+    rank = func.row_number().over(partition_by=Like.tweet_id, order_by=(_sample_order(user_id), Like.id))
+    ranked = (
+        select(Like.tweet_id, Like.user_id, User.name, rank.label("rank"))
+        .join(User, User.id == Like.user_id)
+        .where(Like.tweet_id.in_(tweet_ids))
+        .subquery()
+    )
+    rows = db.execute(
+        select(ranked.c.tweet_id, ranked.c.user_id, ranked.c.name)
+        .where(ranked.c.rank <= sample_size)
+        .order_by(ranked.c.tweet_id, ranked.c.rank)
+    )
+    grouped: dict[int, list[dict]] = defaultdict(list)
+    for tweet_id, liker_id, name in rows:
+        grouped[tweet_id].append({"user_id": liker_id, "name": name})
+    return grouped
+
+
+def serialize_feed_row(row: Row, attachments: list[dict], likers: list[dict]) -> dict:
+    """The ``TweetOut`` shape as a plain dict, encoded later by orjson without model validation."""
+    return {
+        "id": row.id,
+        "content": row.content,
+        "attachments": [attachment["path"] for attachment in attachments],
+        "attachment_variants": [attachment["variants"] or {} for attachment in attachments],
+        "author": {"id": row.author_id, "name": row.author_name},
+        "likes": likers,
+        "like_count": row.like_count,
+        "liked_by_me": bool(row.liked_by_me),
+        "stamp": row.created_at,
+    }
+
+
+def load_feed_page(
+    db: Session, user_id: int, offset: int | None, limit: int | None, after: FeedKey | None
+) -> tuple[list[dict], FeedKey | None]:
+    """Return one serialized feed page and the sort key of its last tweet (``None`` when the page is empty)."""
+    query = _page_query(user_id, offset, limit, after)
+    sample_size = max(settings.feed_sample_likers, 0)
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_json_aggregates(query, user_id, sample_size)).all()
+        items = [serialize_feed_row(row, row.attachments, row.likers) for row in rows]
+    else:
+        rows = db.execute(query).all()
+        tweet_ids = [row.id for row in rows]
+        attachments = _attachments_by_tweet(db, tweet_ids) if tweet_ids else {}
+        likers = _likers_by_tweet(db, tweet_ids, user_id, sample_size) if tweet_ids and sample_size else {}
+        items = [serialize_feed_row(row, attachments.get(row.id, []), likers.get(row.id, [])) for row in rows]
+    last_key = (rows[-1].like_count, rows[-1].created_at, rows[-1].id) if rows else None
+    return items, last_key
+
+
+def load_likers_page(
+    db: Session, tweet_id: int, limit: int, after_id: int | None = None
+) -> tuple[list[dict], int | None]:
+    """One keyset page (by like id) of a tweet's likers and the id to continue after, ``None`` on the last page."""
+    query = (
+        select(Like.id.label("like_id"), Like.user_id, User.name)
+        .join(User, User.id == Like.user_id)
+        .where(Like.tweet_id == tweet_id)
+    )
+    if after_id is not None:
+        query = query.where(Like.id > after_id)
+    rows = db.execute(query.order_by(Like.id).limit(limit)).all()
+    likers = [{"user_id": row.user_id, "name": row.name} for row in rows]
+    return likers, rows[-1].like_id if len(rows) == limit else None
+
+
+def invalidate_feeds_of(db: Session, *author_ids: int) -> None:
+    """Drop cached feed pages of everyone who sees these authors' tweets: the authors and their followers."""
+    if not response_cache.enabled or not author_ids:
+        return
+    follower_ids = {row.follower_id for row in db.query(Follow.follower_id).filter(Follow.followee_id.in_(author_ids))}
+    response_cache.invalidate("feed", [*author_ids, *follower_ids])
+
+
+def invalidate_liker_feeds(*user_ids: int) -> None:
+    """Drop cached feed pages after likes: only the likers' own ``liked_by_me`` must change at once.
+
+    Other viewers' ``like_count`` may lag by up to the cache TTL, which saves fanning every like out to all
+    followers of the author.
+    """
+    if user_ids:
+        response_cache.invalidate("feed", user_ids)
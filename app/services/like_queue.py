@@ -0,0 +1,253 @@
+"""Write-behind queue for like/unlike events.
+
+With ``settings.like_write_behind`` enabled the like endpoints only append ``(user_id, tweet_id, liked)`` to a local
+log and an in-memory map, and answer right away. A background thread drains the map every
+``like_queue_flush_interval`` seconds (or as soon as ``like_queue_max_batch`` events are waiting): events for the same
+user and tweet coalesce to the last one, and each chunk is applied in one transaction with one conflict-ignoring
+insert per tweet, one ``DELETE`` for all unlikes and one ``UPDATE`` adjusting every touched ``like_count``.
+
+The log is rotated to ``<log>.flushing`` before a flush and removed after its commit; on start both files are
+replayed. Applying an event is idempotent, so a crash between commit and removal only replays work already done.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, TextIO
+
+from sqlalchemy import case, delete, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.statements import insert_ignore
+from app.models.like import Like
+from app.models.tweet import Tweet
+from app.models.user import User
+from app.services.feed import invalidate_liker_feeds
+
+logger = logging.getLogger(__name__)
+
+LikeEvent = tuple[int, int]
+
+
+class LikeQueue:
+    def __init__(
+        self,
+        log_path: Path,
+        session_factory: Callable[[], Session],
+        flush_interval: float = 0.5,
+        max_batch: int = 1000,
+        max_pending: int = 50_000,
+        fsync: bool = True,
+    ) -> None:
+        self.log_path = log_path
+        self.flushing_path = log_path.with_name(f"{log_path.name}.flushing")
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.fsync = fsync
+
+        self._pending: dict[LikeEvent, bool] = {}
+        self._oldest: float | None = None
+        self._log: TextIO | None = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.submitted = 0
+        self.applied = 0
+        self.batches = 0
+        self.failures = 0
+        self.max_lag = 0.0
+        self.last_flush_seconds = 0.0
+        self.last_error: str | None = None
+
+    def submit(self, user_id: int, tweet_id: int, liked: bool) -> None:
+        """Durably record a like (``liked=True``) or unlike; blocks on a synchronous flush when the queue is full."""
+        with self._lock:
+            log = self._open_log()
+            log.write(f"{user_id} {tweet_id} {int(liked)}\n")
+            log.flush()
+            if self.fsync:
+                os.fsync(log.fileno())
+            self._enqueue(user_id, tweet_id, liked)
+            self.submitted += 1
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self.flush()
+        elif pending >= self.max_batch:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Apply everything queued so far; returns the number of coalesced events written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+                self._rotate_log()
+            started = time.monotonic()
+            events = list(batch.items())
+            try:
+                for start in range(0, len(events), self.max_batch):
+                    with self.session_factory() as db:
+                        self._apply(db, events[start : start + self.max_batch])
+            except Exception as exc:
+                self._requeue(batch, oldest)
+                self.failures += 1
+                self.last_error = repr(exc)
+                logger.exception("Like queue flush failed; %d events kept for the next attempt", len(batch))
+                return 0
+            self.flushing_path.unlink(missing_ok=True)
+            self.applied += len(events)
+            self.batches += 1
+            self.last_flush_seconds = time.monotonic() - started
+            self.max_lag = max(self.max_lag, time.monotonic() - oldest)
+            return len(events)
+
+    def start(self) -> None:
+        """Replay the on-disk log left by a previous process and start the background flusher."""
+        self._replay()
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="like-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write out whatever is still queued."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+        self.flush()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+            lag = time.monotonic() - self._oldest if self._oldest is not None else 0.0
+        return {
+            "pending": pending,
+            "lag_seconds": round(lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "last_error": self.last_error,
+        }
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _enqueue(self, user_id: int, tweet_id: int, liked: bool) -> None:
+        key = (user_id, tweet_id)
+        self._pending.pop(key, None)
+        self._pending[key] = liked
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def _requeue(self, batch: dict[LikeEvent, bool], oldest: float) -> None:
+        with self._lock:
+            # Events submitted during the failed flush are newer and win over the batch being put back.
+            self._pending = {**batch, **self._pending}
+            self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+
+    def _open_log(self) -> TextIO:
+        if self._log is None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = self.log_path.open("a", encoding="ascii")
+        return self._log
+
+    def _rotate_log(self) -> None:
+        """Move the live log aside so it survives until the batch it describes is committed."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if not self.log_path.exists():
+            return
+        if self.flushing_path.exists():
+            # A previous flush failed: its events are back in the queue, so keep both logs in order.
+            with self.flushing_path.open("a", encoding="ascii") as target:
+                target.write(self.log_path.read_text(encoding="ascii"))
+            self.log_path.unlink()
+        else:
+            self.log_path.replace(self.flushing_path)
+
+    def _replay(self) -> None:
+        with self._lock:
+            for path in (self.flushing_path, self.log_path):
+                if not path.exists():
+                    continue
+                for line in path.read_text(encoding="ascii").splitlines():
+                    try:
+                        user_id, tweet_id, liked = (int(part) for part in line.split())
+                    except ValueError:
+                        continue  # a torn last line from a crash mid-write
+                    self._enqueue(user_id, tweet_id, bool(liked))
+
+    @staticmethod
+    def _apply(db: Session, events: list[tuple[LikeEvent, bool]]) -> None:
+        likers: dict[int, list[int]] = defaultdict(list)
+        unlikes: list[LikeEvent] = []
+        for (user_id, tweet_id), liked in events:
+            if liked:
+                likers[tweet_id].append(user_id)
+            else:
+                unlikes.append((user_id, tweet_id))
+
+        deltas: Counter[int] = Counter()
+        for tweet_id, user_ids in likers.items():
+            rows = select(User.id, Tweet.id).join(Tweet, Tweet.id == tweet_id).where(User.id.in_(user_ids))
+            deltas[tweet_id] += len(insert_ignore(db, Like, ["user_id", "tweet_id"], rows, returning=Like.tweet_id))
+        if unlikes:
+            removed = db.execute(
+                delete(Like)
+                .where(tuple_(Like.user_id, Like.tweet_id).in_(unlikes))
+                .returning(Like.tweet_id)
+                .execution_options(synchronize_session=False)
+            )
+            deltas.subtract(removed.scalars())
+
+        changed = {tweet_id: delta for tweet_id, delta in deltas.items() if delta}
+        if changed:
+            db.execute(
+                update(Tweet)
+                .where(Tweet.id.in_(changed))
+                .values(like_count=Tweet.like_count + case(changed, value=Tweet.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        invalidate_liker_feeds(*{user_id for (user_id, _), _ in events})
+
+
+def write_behind() -> bool:
+    return settings.like_write_behind
+
+
+like_queue = LikeQueue(
+    Path(settings.like_queue_log),
+    SessionLocal,
+    flush_interval=settings.like_queue_flush_interval,
+    max_batch=settings.like_queue_max_batch,
+    max_pending=settings.like_queue_max_pending,
+    fsync=settings.like_queue_fsync,
+)
@@ -0,0 +1,95 @@
+"""Resized WebP derivatives of uploaded images.
+
+Encoding runs in a process pool after the upload response has been sent; the resulting URLs are stored on
+``Media.variants`` and emitted next to each attachment in the feed. Pillow is optional: without it uploads simply
+keep serving the original file.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.deps.auth import Database
+from app.models.media import Media
+
+try:
+    from PIL import Image, UnidentifiedImageError
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+# Variant name -> bounding box; ``None`` keeps the original dimensions and only re-encodes to WebP.
+VARIANT_SIZES: dict[str, tuple[int, int] | None] = {
+    "thumb": (160, 160),
+    "medium": (640, 640),
+    "webp": None,
+}
+
+# Variant name -> tag in the file name ``<hash>.<tag>.webp``; the full-size re-encode becomes ``<hash>.full.webp``.
+VARIANT_TAGS = {"thumb": "thumb", "medium": "medium", "webp": "full"}
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def variants_enabled() -> bool:
+    return Image is not None and settings.media_variants_enabled
+
+
+def generate_variants(source: str) -> dict[str, str]:
+    """Write every variant of ``source`` next to it and return ``{name: url}``; unreadable images yield ``{}``."""
+    source_path = Path(source)
+    try:
+        with Image.open(source_path) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            urls = {}
+            for name, size in VARIANT_SIZES.items():
+                target = source_path.with_name(f"{source_path.stem}.{VARIANT_TAGS[name]}.webp")
+                if not target.exists():
+                    variant = image.copy()
+                    if size is not None:
+                        variant.thumbnail(size)
+                    partial = target.with_name(f".{target.name}.part")
+                    variant.save(partial, format="WEBP", quality=settings.media_variant_quality)
+                    partial.replace(target)
+                urls[name] = f"/media/{target.name}"
+            return urls
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.media_variant_workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _record_variants(db: Session, media_id: int, variants: dict[str, str]) -> None:
+    db.query(Media).filter(Media.id == media_id).update({Media.variants: variants}, synchronize_session=False)
+    db.commit()
+
+
+async def build_variants(db: Database, media_id: int, source: Path) -> None:
+    """Background task: encode the variants off-process, then store their URLs on the media row."""
+    loop = asyncio.get_running_loop()
+    variants = await loop.run_in_executor(_get_executor(), generate_variants, str(source))
+    if not variants:
+        return
+    db = db.fork()
+    try:
+        await db.run(_record_variants, media_id, variants)
+    finally:
+        await db.close()
@@ -0,0 +1,139 @@
+"""Chunked removal of an account and everything it owns.
+
+Every step deletes at most ``chunk_size`` rows per transaction and commits before the next chunk, so a prolific
+account never holds row locks (or a long transaction) for more than one chunk at a time. Rows hanging off a deleted
+tweet (likes, attachments, timeline entries) go with it through ``ON DELETE CASCADE``. Media files are only unlinked
+once no ``Media`` row references their path any more, since identical uploads share one file.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.deps.auth import principal_cache
+from app.models.follow import Follow
+from app.models.like import Like
+from app.models.media import Media
+from app.models.timeline import TimelineEntry
+from app.models.tweet import Tweet
+from app.models.user import User
+from app.routers.medias import MEDIA_DIR
+from app.services.feed import invalidate_feeds_of
+
+
+def _delete_chunks(db: Session, model, predicate, chunk_size: int, returning=None) -> tuple[int, list]:
+    """Delete matching rows ``chunk_size`` at a time, committing after each chunk."""
+    deleted, returned = 0, []
+    while True:
+        ids = db.execute(select(model.id).where(predicate).order_by(model.id).limit(chunk_size)).scalars().all()
+        if not ids:
+            return deleted, returned
+        stmt = delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        if returning is None:
+            db.execute(stmt)
+        else:
+            returned.extend(db.execute(stmt.returning(*returning)).all())
+        db.commit()
+        deleted += len(ids)
+
+
+def _unlike_chunks(db: Session, user_id: int, chunk_size: int) -> int:
+    """Remove the user's likes, decrementing ``like_count`` of each liked tweet in the same transaction."""
+    removed = 0
+    while True:
+        rows = db.execute(
+            delete(Like)
+            .where(Like.id.in_(select(Like.id).where(Like.user_id == user_id).order_by(Like.id).limit(chunk_size)))
+            .returning(Like.tweet_id)
+            .execution_options(synchronize_session=False)
+        )
+        counts = Counter(rows.scalars())
+        if not counts:
+            return removed
+        updated = db.execute(
+            update(Tweet)
+            .where(Tweet.id.in_(counts))
+            .values(like_count=Tweet.like_count - case(counts, value=Tweet.id, else_=0))
+            .returning(Tweet.author_id)
+            .execution_options(synchronize_session=False)
+        )
+        author_ids = set(updated.scalars())
+        db.commit()
+        invalidate_feeds_of(db, *author_ids)
+        removed += counts.total()
+
+
+def _media_files(path: str, variants: dict[str, str] | None) -> list[Path]:
+    urls = [path, *(variants or {}).values()]
+    return [MEDIA_DIR / Path(url).name for url in urls if url.startswith("/media/")]
+
+
+def _remove_orphaned_files(db: Session, medias: list) -> int:
+    paths = {row.path for row in medias}
+    still_used = set(db.execute(select(Media.path).where(Media.path.in_(paths))).scalars()) if paths else set()
+    removed = 0
+    for row in medias:
+        if row.path in still_used:
+            continue
+        for file in _media_files(row.path, row.variants):
+            if file.is_file():
+                file.unlink()
+                removed += 1
+    return removed
+
+
+def purge_user(db: Session, user_id: int, chunk_size: int | None = None) -> dict[str, int] | None:
+    """Delete a user with their tweets, likes, follows, timeline and media; ``None`` when the user does not exist."""
+    chunk_size = chunk_size or settings.purge_chunk_size
+    if db.get(User, user_id) is None:
+        return None
+    db.rollback()
+
+    counts: dict[str, int] = {}
+    counts["tweets"], _ = _delete_chunks(db, Tweet, Tweet.author_id == user_id, chunk_size)
+    invalidate_feeds_of(db, user_id)
+    counts["likes"] = _unlike_chunks(db, user_id, chunk_size)
+
+    counts["follows"], follows = _delete_chunks(
+        db,
+        Follow,
+        (Follow.follower_id == user_id) | (Follow.followee_id == user_id),
+        chunk_size,
+        returning=(Follow.follower_id, Follow.followee_id),
+    )
+    counterparts = {row.followee_id if row.follower_id == user_id else row.follower_id for row in follows}
+    response_cache.invalidate("feed", counterparts)
+    response_cache.invalidate("profile", counterparts)
+
+    while True:
+        deleted = db.execute(
+            delete(TimelineEntry)
+            .where(
+                TimelineEntry.owner_id == user_id,
+                TimelineEntry.tweet_id.in_(
+                    select(TimelineEntry.tweet_id).where(TimelineEntry.owner_id == user_id).limit(chunk_size)
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if not deleted.rowcount:
+            break
+
+    counts["medias"], medias = _delete_chunks(
+        db, Media, Media.uploader_id == user_id, chunk_size, returning=(Media.path, Media.variants)
+    )
+    counts["files"] = _remove_orphaned_files(db, medias)
+
+    db.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
+    db.commit()
+    principal_cache.invalidate_user(user_id)
+    response_cache.invalidate("feed", [user_id])
+    response_cache.invalidate("profile", [user_id])
+    return counts
@@ -0,0 +1,74 @@
+"""Fan-out-on-write home timelines.
+
+When ``settings.feed_fanout == "write"`` every tweet id is pushed into the ``timeline_entries`` rows of its
+author and the author's followers at write time, so the feed reads one indexed list per reader instead of
+resolving follows on every request. All helpers only stage statements; the caller owns the commit.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.follow import Follow
+from app.models.timeline import TimelineEntry
+from app.models.tweet import Tweet
+
+_COLUMNS = ["owner_id", "tweet_id", "author_id"]
+
+
+def fanout_on_write() -> bool:
+    return settings.feed_fanout == "write"
+
+
+def fan_out_tweet(db: Session, tweet_id: int, author_id: int) -> None:
+    readers = union_all(
+        select(literal(author_id), literal(tweet_id), literal(author_id)),
+        select(Follow.follower_id, literal(tweet_id), literal(author_id)).where(Follow.followee_id == author_id),
+    )
+    db.execute(insert(TimelineEntry).from_select(_COLUMNS, readers))
+
+
+def fan_out_tweets(db: Session, tweet_ids: list[int]) -> None:
+    """``fan_out_tweet`` for a batch of freshly inserted tweets, as one statement."""
+    readers = union_all(
+        select(Tweet.author_id, Tweet.id, Tweet.author_id).where(Tweet.id.in_(tweet_ids)),
+        select(Follow.follower_id, Tweet.id, Tweet.author_id)
+        .join(Tweet, Tweet.author_id == Follow.followee_id)
+        .where(Tweet.id.in_(tweet_ids)),
+    )
+    db.execute(insert(TimelineEntry).from_select(_COLUMNS, readers))
+
+
+def backfill_author(db: Session, owner_id: int, author_id: int) -> None:
+    tweets = select(literal(owner_id), Tweet.id, Tweet.author_id).where(Tweet.author_id == author_id)
+    already_present = select(TimelineEntry.tweet_id).where(
+        TimelineEntry.owner_id == owner_id, TimelineEntry.author_id == author_id
+    )
+    db.execute(insert(TimelineEntry).from_select(_COLUMNS, tweets.where(Tweet.id.not_in(already_present))))
+
+
+def backfill_authors(db: Session, owner_id: int, author_ids: list[int]) -> None:
+    """``backfill_author`` for several newly followed authors, as one statement."""
+    tweets = select(literal(owner_id), Tweet.id, Tweet.author_id).where(Tweet.author_id.in_(author_ids))
+    already_present = select(TimelineEntry.tweet_id).where(
+        TimelineEntry.owner_id == owner_id, TimelineEntry.author_id.in_(author_ids)
+    )
+    db.execute(insert(TimelineEntry).from_select(_COLUMNS, tweets.where(Tweet.id.not_in(already_present))))
+
+
+def prune_author(db: Session, owner_id: int, author_id: int) -> None:
+    db.execute(delete(TimelineEntry).where(TimelineEntry.owner_id == owner_id, TimelineEntry.author_id == author_id))
+
+
+def rebuild_timelines(db: Session) -> int:
+    """Rematerialize every timeline from follows and tweets; returns the number of entries written."""
+    db.execute(delete(TimelineEntry))
+    entries = union_all(
+        select(Tweet.author_id, Tweet.id, Tweet.author_id),
+        select(Follow.follower_id, Tweet.id, Tweet.author_id).join(Tweet, Tweet.author_id == Follow.followee_id),
+    )
+    result = db.execute(insert(TimelineEntry).from_select(_COLUMNS, entries))
+    db.commit()
+    return result.rowcount
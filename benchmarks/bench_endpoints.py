@@ -0,0 +1,321 @@
+"""Endpoint latency benchmarks against a generated dataset, with JSON baselines.
+
+    python -m benchmarks.bench_endpoints --compare benchmarks/baselines/endpoints.json
+    python -m benchmarks.bench_endpoints --save benchmarks/baselines/endpoints.json  # refresh the reference
+
+The real ``app.main.app`` is driven in-process through ``TestClient`` and, with ``--transport uvicorn``, over HTTP
+through a uvicorn server started in a background thread. Unless ``DATABASE_URL`` is set, a fresh SQLite file in a
+temporary working directory is filled by ``app.seed.generate_dataset`` in a child process, so generation does not
+inflate the benchmark's memory. Each scenario reports p50/p95/p99 latency, sequential throughput, the peak RSS
+reached during that scenario (Linux resets the high-water mark through ``/proc/self/clear_refs``; elsewhere it falls
+back to the process-lifetime ``ru_maxrss``) and how much RSS it left behind. ``--compare`` exits with status 1 when
+any scenario's ``--metric`` grew by more than ``--threshold`` against the baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+Request = Callable[[object, int], object]
+
+
+def summarize(samples: list[float], elapsed: float) -> dict[str, float]:
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "requests": len(samples),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "rps": round(len(samples) / elapsed, 1),
+    }
+
+
+def _proc_status_kib(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark (VmHWM) so the next reading covers one scenario only."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class MemoryWindow:
+    """Peak RSS within the ``with`` block, and the RSS it left behind, in MiB."""
+
+    def __enter__(self) -> MemoryWindow:
+        self.scoped = _reset_peak_rss()
+        self.before = _proc_status_kib("VmRSS")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        peak = _proc_status_kib("VmHWM") if self.scoped else None
+        if peak is None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        after = _proc_status_kib("VmRSS")
+        self.result = {"peak_rss_mb": round(peak / 1024, 1)}
+        if self.before is not None and after is not None:
+            self.result["rss_growth_mb"] = round((after - self.before) / 1024, 1)
+
+
+# Dataset and run size of benchmarks/baselines/endpoints.json; every saved report records them in "meta".
+RUN_DEFAULTS = {"users": 2000, "tweets": 50_000, "avg_follows": 50.0, "seed": 1, "requests": 200}
+
+
+def compare(baseline: dict, current: dict, threshold: float, metric: str = "p95_ms") -> list[str]:
+    """Return one message per scenario whose ``metric`` regressed by more than ``threshold`` (0.2 = +20%)."""
+    regressions = []
+    for name, result in sorted(current["scenarios"].items()):
+        before = baseline["scenarios"].get(name, {}).get(metric)
+        if not before:
+            continue
+        change = result[metric] / before - 1
+        if change > threshold:
+            regressions.append(f"{name}: {metric} {before:.2f} -> {result[metric]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def _prepare_database(args: argparse.Namespace) -> None:
+    """Point the app at the benchmark database before it is imported; generate the dataset if it is new."""
+    workdir = Path(tempfile.mkdtemp(prefix="microblog-bench-"))
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    os.chdir(workdir)  # uploads land in ./media of the scratch directory
+    os.environ.setdefault("APP_SKIP_BOOTSTRAP", "1")
+    if "DATABASE_URL" in os.environ:
+        return
+    os.environ["DATABASE_URL"] = f"sqlite+pysqlite:///{workdir / 'bench.db'}"
+
+    repo = str(Path(__file__).resolve().parents[1])
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [repo, os.environ.get("PYTHONPATH")]))}
+    call = f"generate_database({args.users}, {args.tweets}, {args.avg_follows}, {args.seed})"
+    subprocess.run(
+        [sys.executable, "-c", f"from benchmarks.bench_endpoints import generate_database; {call}"], env=env, check=True
+    )
+
+
+def generate_database(users: int, tweets: int, avg_follows: float, seed: int) -> None:
+    """Create the schema, the demo users and a synthetic dataset in ``DATABASE_URL`` (run in a child process)."""
+    import app.db.base  # noqa: F401
+    from app.db.session import Base, SessionLocal, engine
+    from app.seed import generate_dataset, seed_demo_data
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        seed_demo_data(db)
+        started = time.perf_counter()
+        counts = generate_dataset(db, users, tweets, avg_follows=avg_follows, seed=seed)
+    print(f"dataset: {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+def _fixtures() -> dict:
+    """API keys of viewers with low, median and high follow fan-out, plus a hot tweet for like storms."""
+    from sqlalchemy import func
+
+    from app.db.session import SessionLocal
+    from app.models import Follow, Tweet, User
+
+    with SessionLocal() as db:
+        following = func.count(Follow.id).label("following")
+        rows = (
+            db.query(User.id, User.api_key, following)
+            .outerjoin(Follow, Follow.follower_id == User.id)
+            .group_by(User.id)
+            .order_by(following, User.id)
+            .all()
+        )
+        hot_tweet = db.query(Tweet.id).order_by(Tweet.like_count.desc()).first().id
+    return {
+        "viewers": {"low": rows[0], "mid": rows[len(rows) // 2], "high": rows[-1]},
+        "likers": [row.api_key for row in rows[: max(len(rows) // 10, 1)]],
+        "hot_tweet": hot_tweet,
+        "profile": rows[-1].id,
+    }
+
+
+def scenarios(fixtures: dict) -> dict[str, Request]:
+    """Scenario name -> callable issuing request number ``i`` through ``client``."""
+    viewers = fixtures["viewers"]
+    likers = fixtures["likers"]
+    hot_tweet = fixtures["hot_tweet"]
+    default_key = viewers["mid"].api_key
+
+    def feed(api_key: str) -> Request:
+        return lambda client, i: client.get("/api/tweets", params={"limit": 20}, headers={"api-key": api_key})
+
+    def like_storm(client, i: int):
+        # Each liker alternates like/unlike, so the storm keeps writing instead of hitting the no-op path.
+        api_key = likers[i % len(likers)]
+        method = client.post if (i // len(likers)) % 2 == 0 else client.delete
+        return method(f"/api/tweets/{hot_tweet}/likes", headers={"api-key": api_key})
+
+    def upload(client, i: int):
+        content = b"\x89PNG\r\n\x1a\n" + i.to_bytes(8, "big") * 512
+        files = {"file": (f"bench-{i}.png", content, "image/png")}
+        return client.post("/api/medias", headers={"api-key": default_key}, files=files)
+
+    return {
+        **{f"feed_fanout_{level}": feed(viewer.api_key) for level, viewer in viewers.items()},
+        "list_users": lambda client, i: client.get("/api/users", headers={"api-key": default_key}),
+        "profile": lambda client, i: client.get(f"/api/users/{fixtures['profile']}", headers={"api-key": default_key}),
+        "like_storm": like_storm,
+        "media_upload": upload,
+    }
+
+
+def run_scenario(client, request: Request, requests: int, warmup: int) -> dict[str, float]:
+    with MemoryWindow() as memory:
+        for i in range(warmup):
+            request(client, i)
+        samples = []
+        started = time.perf_counter()
+        for i in range(warmup, warmup + requests):
+            began = time.perf_counter()
+            response = request(client, i)
+            samples.append(time.perf_counter() - began)
+            if response.status_code >= 400:
+                raise RuntimeError(f"request failed with {response.status_code}: {response.text[:200]}")
+        elapsed = time.perf_counter() - started
+    return {**summarize(samples, elapsed), **memory.result}
+
+
+class UvicornThread:
+    """A uvicorn server for ``app`` on a free local port, running in a daemon thread."""
+
+    def __init__(self, app) -> None:
+        import uvicorn
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # These default to the values recorded in the --compare baseline, then to RUN_DEFAULTS.
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--tweets", type=int)
+    parser.add_argument("--avg-follows", type=float)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--requests", type=int, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--transport", choices=["inprocess", "uvicorn"], action="append")
+    parser.add_argument("--only", help="regex selecting scenario names")
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (0.2 = +20%%)")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms"])
+    args = parser.parse_args(argv)
+    save = args.save.resolve() if args.save else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    recorded = baseline["meta"] if baseline else {}
+    for key, default in RUN_DEFAULTS.items():
+        if getattr(args, key) is None:
+            setattr(args, key, recorded.get(key, default))
+        elif key in recorded and getattr(args, key) != recorded[key]:
+            parser.error(f"--{key.replace('_', '-')} {getattr(args, key)} differs from the baseline's {recorded[key]}")
+
+    _prepare_database(args)
+    import httpx
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    selected = {
+        name: request for name, request in scenarios(_fixtures()).items() if not args.only or re.search(args.only, name)
+    }
+    results = {}
+    for transport in args.transport or ["inprocess"]:
+        if transport == "inprocess":
+            context = TestClient(app)
+        else:
+            context = _HttpClient(httpx, app)
+        with context as client:
+            for name, request in selected.items():
+                result = run_scenario(client, request, args.requests, args.warmup)
+                results[f"{transport}:{name}"] = result
+                print(
+                    f"{transport + ':' + name:<32} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+                    f"p99 {result['p99_ms']:8.2f} ms  {result['rps']:8.1f} req/s  "
+                    f"peak rss {result['peak_rss_mb']:.0f} MB ({result.get('rss_growth_mb', 0):+.1f})"
+                )
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            **{key: getattr(args, key) for key in RUN_DEFAULTS},
+        },
+        "scenarios": results,
+    }
+    if save:
+        save.parent.mkdir(parents=True, exist_ok=True)
+        save.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    if baseline is None:
+        return 0
+    regressions = compare(baseline, report, args.threshold, args.metric)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+class _HttpClient:
+    """``httpx.Client`` against a uvicorn thread, usable in the same ``with`` as ``TestClient``."""
+
+    def __init__(self, httpx, app) -> None:
+        self.httpx = httpx
+        self.server = UvicornThread(app)
+
+    def __enter__(self):
+        self.client = self.httpx.Client(base_url=self.server.__enter__())
+        return self.client
+
+    def __exit__(self, *exc) -> None:
+        self.client.close()
+        self.server.__exit__(*exc)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Compare the feed serialization paths on a synthetic page.
+
+    python -m benchmarks.bench_serialization --tweets 200 --likes 300
+
+``pydantic`` is the previous path (TweetOut/UserBrief/LikeInfo per ORM object, ``model_dump``, then FastAPI's
+``jsonable_encoder`` + ``json.dumps``); ``orjson`` is the current path: ``serialize_feed_row`` over projected rows,
++ ``encode_json``. The feed used to embed every liker and now embeds a ``FEED_SAMPLE_LIKERS`` sample, so the pydantic
+path runs twice: with the same sample as ``orjson`` (the serialization speedup alone) and with every liker (the
+previous payload, which adds the effect of capping likers).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import timeit
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("APP_SKIP_BOOTSTRAP", "1")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.serialization import encode_json  # noqa: E402
+from app.models import Like, Media, Tweet, User  # noqa: E402
+from app.services.feed import serialize_feed_row  # noqa: E402
+from app.schemas.tweet import LikeInfo, TweetOut  # noqa: E402
+from app.schemas.user import UserBrief  # noqa: E402
+
+
+def build_page(tweet_count: int, likes_per_tweet: int) -> list[Tweet]:
+    users = [User(id=i, name=f"user {i}", api_key=f"key-{i}") for i in range(max(likes_per_tweet, 1) + 1)]
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    tweets = []
+    for i in range(tweet_count):
+        tweet = Tweet(id=i, content=f"tweet number {i} " * 4, author_id=0, like_count=likes_per_tweet)
+        tweet.created_at = started + timedelta(minutes=i)
+        tweet.author = users[0]
+        tweet.medias = [Media(id=i, path=f"/media/{i:064x}.png", uploader_id=0, variants={"thumb": "/media/t.webp"})]
+        tweet.likes = [Like(user_id=user.id, tweet_id=i, user=user) for user in users[1 : likes_per_tweet + 1]]
+        tweets.append(tweet)
+    return tweets
+
+
+FeedRow = namedtuple("FeedRow", "id content created_at like_count author_id author_name liked_by_me")
+
+
+def build_rows(tweets: list[Tweet]) -> list[tuple[FeedRow, list[dict], list[dict]]]:
+    """The same page as the loader returns it: a projected row plus aggregated attachments and sampled likers."""
+    sample = settings.feed_sample_likers
+    return [
+        (
+            FeedRow(
+                tweet.id, tweet.content, tweet.created_at, tweet.like_count, tweet.author.id, tweet.author.name, False
+            ),
+            [{"path": media.path, "variants": media.variants} for media in tweet.medias],
+            [{"user_id": like.user_id, "name": like.user.name} for like in tweet.likes[:sample]],
+        )
+        for tweet in tweets
+    ]
+
+
+def pydantic_path(tweets: list[Tweet], likers: int | None = None) -> bytes:
+    payload = []
+    for tweet in tweets:
+        payload.append(
+            TweetOut(
+                id=tweet.id,
+                content=tweet.content,
+                attachments=[media.path for media in tweet.medias],
+                attachment_variants=[media.variants or {} for media in tweet.medias],
+                author=UserBrief.model_validate(tweet.author),
+                likes=[LikeInfo(user_id=like.user_id, name=like.user.name) for like in tweet.likes[:likers]],
+                like_count=tweet.like_count,
+                liked_by_me=False,
+                stamp=tweet.created_at,
+            ).model_dump()
+        )
+    body = {"result": True, "tweets": payload, "next_cursor": None}
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def orjson_path(rows: list[tuple[FeedRow, list[dict], list[dict]]]) -> bytes:
+    items = [serialize_feed_row(row, attachments, likers) for row, attachments, likers in rows]
+    return encode_json({"result": True, "tweets": items, "next_cursor": None})
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--likes", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tweets = build_page(args.tweets, args.likes)
+    rows = build_rows(tweets)
+    sample = settings.feed_sample_likers
+    sampled, current = json.loads(pydantic_path(tweets, sample)), json.loads(orjson_path(rows))
+    assert [tweet["id"] for tweet in sampled["tweets"]] == [tweet["id"] for tweet in current["tweets"]]
+    assert [tweet["likes"] for tweet in sampled["tweets"]] == [tweet["likes"] for tweet in current["tweets"]]
+
+    paths = {
+        "pydantic, every liker": lambda: pydantic_path(tweets),
+        f"pydantic, {sample} likers": lambda: pydantic_path(tweets, sample),
+        f"orjson, {sample} likers": lambda: orjson_path(rows),
+    }
+    results = {}
+    for name, fn in paths.items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        results[name] = min(timer.repeat(repeat=args.repeat, number=number)) / number
+        print(f"{name:>22}: {results[name] * 1000:8.2f} ms per page, {len(fn()) / 1024:8.1f} KiB")
+    everyone, capped, fast = results.values()
+    print(f"serialization speedup (same likers): {capped / fast:.1f}x")
+    print(f"liker capping (pydantic, {args.likes} -> {sample}): {everyone / capped:.1f}x")
+    print(f"combined: {everyone / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
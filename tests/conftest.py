@@ -1,19 +1,21 @@
+import asyncio
 import os
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 os.environ.setdefault("APP_SKIP_BOOTSTRAP", "1")
+os.environ.setdefault("SQL_STRICT_LAZY_LOADS", "1")
 
-from app.deps.auth import get_db
+from app.deps.auth import Database, get_database, principal_cache
 from app.main import app
-from app.db.session import Base
+from app.db.session import Base, enforce_sqlite_foreign_keys
 from app.seed import seed_demo_data
 
-
 TEST_DATABASE_URL = "sqlite+pysqlite:///:memory:"
 
 engine = create_engine(
@@ -21,11 +23,23 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+enforce_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
+@pytest.fixture(autouse=True)
+def media_dir(tmp_path, monkeypatch):
+    """Keep uploads, variants and the seeded sample image out of the repository's media/ directory."""
+    directory = tmp_path / "uploaded-media"
+    directory.mkdir()
+    for module in ("app.routers.medias", "app.services.purge", "app.seed"):
+        monkeypatch.setattr(f"{module}.MEDIA_DIR", directory)
+    return directory
+
+
 @pytest.fixture()
 def db_session():
+    principal_cache.clear()
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     session = TestingSessionLocal()
@@ -38,13 +52,42 @@ def db_session():
 
 @pytest.fixture()
 def client(db_session):
-    def override_get_db():
+    def override_get_database():
         try:
-            yield db_session
+            yield Database(lambda: db_session)
         finally:
             db_session.rollback()
 
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_database] = override_get_database
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def async_client(tmp_path):
+    """A client whose requests go through AsyncSession on aiosqlite instead of the threadpool."""
+    principal_cache.clear()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}", poolclass=NullPool)
+    enforce_sqlite_foreign_keys(async_engine.sync_engine)
+    AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, autocommit=False)
+
+    async def prepare():
+        async with async_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with AsyncTestingSessionLocal() as session:
+            await session.run_sync(seed_demo_data)
+
+    asyncio.run(prepare())
+
+    async def override_get_database():
+        db = Database(AsyncTestingSessionLocal)
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    app.dependency_overrides[get_database] = override_get_database
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
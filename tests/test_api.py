@@ -1,9 +1,38 @@
+import base64
+import hashlib
+import io
+import re
+import time
+from pathlib import Path
+
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.follow import Follow
+from app.models.like import Like
+from app.models.media import Media
+from app.models.timeline import TimelineEntry
 from app.models.tweet import Tweet
 from app.models.user import User
+from app.repair import recount_like_counts
+from app.schemas.tweet import TweetOut
+from app.services.timeline import rebuild_timelines
+
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def query_count(response) -> int:
+    """Statements the request issued, as reported by its Server-Timing header."""
+    return int(SERVER_TIMING_QUERIES.search(response.headers["server-timing"]).group(1))
+
+
+def assert_query_budget(response, budget: int) -> None:
+    count = query_count(response)
+    request = f"{response.request.method} {response.request.url.path}"
+    assert response.status_code < 400, f"{request} failed with {response.status_code}"
+    assert count <= budget, f"{request} issued {count} SQL statements, budget is {budget}"
 
 
 def test_feed_returns_followed_tweets_sorted_by_popularity(client: TestClient, db_session: Session):
@@ -120,3 +149,522 @@ def test_followers_and_following_endpoints(client: TestClient, db_session: Sessi
     following_resp = client.get(f"/api/users/{alice.id}/following", headers={"api-key": "test"})
     assert following_resp.status_code == 200
     assert following_resp.json()["result"] is True
+
+
+def test_feed_cursor_pagination_matches_full_order(client: TestClient, db_session: Session):
+    user = db_session.query(User).filter(User.api_key == "test").first()
+    assert user is not None
+    db_session.add_all([Tweet(content=f"update #{i}", author_id=user.id) for i in range(3)])
+    db_session.commit()
+
+    full = client.get("/api/tweets", headers={"api-key": "test"}).json()["tweets"]
+
+    seen = []
+    cursor = None
+    for _ in range(len(full) + 1):
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/tweets", headers={"api-key": "test"}, params=params).json()
+        seen.extend(tweet["id"] for tweet in page["tweets"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [tweet["id"] for tweet in full]
+
+
+def test_feed_rejects_malformed_cursor(client: TestClient):
+    stamp = "2024-01-01T00:00:00"
+    overflowing = [
+        f'[1e400,"{stamp}",1]',  # int(inf) raises OverflowError
+        f'[{2**63},"{stamp}",1]',  # decodes, but does not fit a BIGINT parameter
+        f'[1,"{stamp}",{2**64}]',
+    ]
+    cursors = ["not-a-cursor"] + [base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=") for raw in overflowing]
+    for cursor in cursors:
+        response = client.get("/api/tweets", headers={"api-key": "test"}, params={"cursor": cursor})
+        assert response.status_code == 422, cursor
+        assert response.json()["result"] is False
+
+
+def test_like_and_unlike_maintain_like_count(client: TestClient, db_session: Session):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    tweet = Tweet(content="count me", author_id=bob.id)
+    db_session.add(tweet)
+    db_session.commit()
+
+    for _ in range(2):
+        assert client.post(f"/api/tweets/{tweet.id}/likes", headers={"api-key": "alice"}).status_code == 200
+    db_session.refresh(tweet)
+    assert tweet.like_count == 1
+
+    assert client.delete(f"/api/tweets/{tweet.id}/likes", headers={"api-key": "alice"}).status_code == 200
+    db_session.refresh(tweet)
+    assert tweet.like_count == 0
+
+
+def test_recount_like_counts_repairs_drift(db_session: Session):
+    tweet = db_session.query(Tweet).order_by(Tweet.id).first()
+    expected = len(tweet.likes)
+    tweet.like_count = expected + 5
+    db_session.commit()
+
+    assert recount_like_counts(db_session) == 1
+    db_session.refresh(tweet)
+    assert tweet.like_count == expected
+
+
+def _feed_ids(client: TestClient, api_key: str) -> list[int]:
+    return [tweet["id"] for tweet in client.get("/api/tweets", headers={"api-key": api_key}).json()["tweets"]]
+
+
+def test_fanout_on_write_timeline_matches_fanout_on_read(client: TestClient, db_session: Session, monkeypatch):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    read_feed = _feed_ids(client, "test")
+
+    monkeypatch.setattr(settings, "feed_fanout", "write")
+    rebuild_timelines(db_session)
+    assert _feed_ids(client, "test") == read_feed
+
+    created = client.post("/api/tweets", headers={"api-key": "bob"}, json={"tweet_data": "fanned out"})
+    tweet_id = created.json()["tweet_id"]
+    assert tweet_id in _feed_ids(client, "test")
+
+    client.delete(f"/api/users/{bob.id}/follow", headers={"api-key": "test"})
+    assert not {tweet_id} & set(_feed_ids(client, "test"))
+
+    client.post(f"/api/users/{bob.id}/follow", headers={"api-key": "test"})
+    assert tweet_id in _feed_ids(client, "test")
+
+    client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "bob"})
+    assert tweet_id not in _feed_ids(client, "test")
+    assert db_session.query(TimelineEntry).filter(TimelineEntry.tweet_id == tweet_id).count() == 0
+
+
+def test_rotated_api_key_is_evicted_from_auth_cache(client: TestClient, db_session: Session):
+    assert client.get("/api/users/me", headers={"api-key": "alice"}).status_code == 200
+
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    alice.api_key = "alice-rotated"
+    db_session.commit()
+
+    assert client.get("/api/users/me", headers={"api-key": "alice"}).status_code == 401
+    response = client.get("/api/users/me", headers={"api-key": "alice-rotated"})
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == alice.id
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("sqlite:///app.db", "sqlite+aiosqlite:///app.db"),
+        ("sqlite+pysqlite:///app.db", "sqlite+aiosqlite:///app.db"),
+        ("postgresql://u:p%40ss@db:5432/blog", "postgresql+asyncpg://u:p%40ss@db:5432/blog"),
+        ("postgresql+psycopg2://u:pw@db/blog", "postgresql+asyncpg://u:pw@db/blog"),
+    ],
+)
+def test_async_url_is_derived_from_driverless_and_sync_urls(url: str, expected: str, monkeypatch):
+    monkeypatch.setattr(settings, "async_database_url", None)
+    monkeypatch.setattr(settings, "database_url", url)
+    assert settings.resolved_async_database_url == expected
+
+    monkeypatch.setattr(settings, "database_url", "mysql+pymysql://u:pw@db/blog")
+    with pytest.raises(ValueError, match="ASYNC_DATABASE_URL"):
+        settings.resolved_async_database_url
+
+
+def test_async_session_serves_reads_and_writes(async_client: TestClient):
+    created = async_client.post("/api/tweets", headers={"api-key": "alice"}, json={"tweet_data": "from the loop"})
+    assert created.status_code == 201
+    tweet_id = created.json()["tweet_id"]
+
+    assert async_client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "test"}).status_code == 200
+
+    feed = async_client.get("/api/tweets", headers={"api-key": "test"}).json()["tweets"]
+    fresh = next(tweet for tweet in feed if tweet["id"] == tweet_id)
+    assert fresh["like_count"] == 1
+    assert [like["name"] for like in fresh["likes"]] == ["Cool Dev"]
+
+    me = async_client.get("/api/users/me", headers={"api-key": "test"}).json()["user"]
+    assert {user["name"] for user in me["following"]} == {"Alice", "Bob"}
+
+
+def test_pool_stats_require_admin(client: TestClient, monkeypatch):
+    assert client.get("/api/admin/pool", headers={"api-key": "test"}).status_code == 403
+
+    monkeypatch.setattr(settings, "admin_api_keys", ["test"])
+    response = client.get("/api/admin/pool", headers={"api-key": "test"})
+    assert response.status_code == 200
+    sync_pool = response.json()["pools"]["sync"]
+    assert {"checked_out", "overflow", "wait_seconds_total"} <= set(sync_pool)
+
+
+def test_identical_uploads_share_one_file_and_media_row(client: TestClient, media_dir: Path):
+    content = b"same bytes " * 10_000
+    first = client.post("/api/medias", headers={"api-key": "bob"}, files={"file": ("a.PNG", content, "image/png")})
+    second = client.post("/api/medias", headers={"api-key": "bob"}, files={"file": ("b.png", content, "image/png")})
+    renamed = client.post("/api/medias", headers={"api-key": "bob"}, files={"file": ("a.jpg", content, "image/jpeg")})
+    other = client.post("/api/medias", headers={"api-key": "alice"}, files={"file": ("c.gif", content, "image/gif")})
+
+    assert first.status_code == second.status_code == renamed.status_code == other.status_code == 200
+    assert first.json()["media_id"] == second.json()["media_id"] == renamed.json()["media_id"]
+    assert other.json()["media_id"] != first.json()["media_id"]
+    stored = [path for path in media_dir.iterdir() if path.name != "welcome.png"]
+    assert [path.name for path in stored] == [f"{hashlib.sha256(content).hexdigest()}.png"]
+    assert stored[0].read_bytes() == content
+
+
+def test_upload_over_size_limit_is_rejected(client: TestClient, media_dir: Path, monkeypatch):
+    monkeypatch.setattr(settings, "media_max_bytes", 1024)
+    # 4 KiB passes the Content-Length pre-check and is cut off while streaming; 64 KiB is refused up front.
+    for size in (4096, 64 * 1024):
+        response = client.post(
+            "/api/medias", headers={"api-key": "bob"}, files={"file": ("big.png", b"x" * size, "image/png")}
+        )
+        assert response.status_code == 413
+        assert response.json()["result"] is False
+    assert [path.name for path in media_dir.iterdir()] == ["welcome.png"]
+
+    missing = client.post("/api/medias", headers={"api-key": "bob"}, data={"other": "field"})
+    assert missing.status_code == 422
+
+
+def test_empty_upload_is_stored(client: TestClient, media_dir: Path):
+    response = client.post("/api/medias", headers={"api-key": "bob"}, files={"file": ("empty.png", b"", "image/png")})
+    assert response.status_code == 200
+    assert (media_dir / f"{hashlib.sha256(b'').hexdigest()}.png").read_bytes() == b""
+    assert not list(media_dir.glob(".upload-*"))
+
+
+def test_uploaded_image_gets_resized_variants(client: TestClient, db_session: Session, media_dir: Path):
+    image_module = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image_module.new("RGB", (1200, 800), color=(200, 30, 30)).save(buffer, format="PNG")
+
+    upload = client.post(
+        "/api/medias", headers={"api-key": "test"}, files={"file": ("red.png", buffer.getvalue(), "image/png")}
+    )
+    media = db_session.get(Media, upload.json()["media_id"])
+    db_session.refresh(media)
+    assert set(media.variants) == {"thumb", "medium", "webp"}
+    stem = Path(media.path).stem
+    assert sorted(path.name for path in media_dir.glob(f"{stem}.*")) == [
+        f"{stem}.{name}" for name in ("full.webp", "medium.webp", "png", "thumb.webp")
+    ]
+    with image_module.open(media_dir / Path(media.variants["thumb"]).name) as thumb:
+        assert max(thumb.size) == 160
+
+    created = client.post(
+        "/api/tweets", headers={"api-key": "test"}, json={"tweet_data": "look", "tweet_media_ids": [media.id]}
+    )
+    feed = client.get("/api/tweets", headers={"api-key": "test"}).json()["tweets"]
+    tweet = next(item for item in feed if item["id"] == created.json()["tweet_id"])
+    assert tweet["attachment_variants"] == [media.variants]
+
+
+def test_users_listing_counts_follows_and_paginates(client: TestClient, db_session: Session):
+    db_session.add_all([User(name=f"Extra {i}", api_key=f"extra-{i}") for i in range(3)])
+    db_session.add(User(name="Al_ias", api_key="alias"))
+    db_session.commit()
+
+    first = client.get("/api/users", headers={"api-key": "test"}, params={"limit": 2}).json()
+    assert len(first["users"]) == 2
+    second = client.get(
+        "/api/users", headers={"api-key": "test"}, params={"limit": 10, "after_id": first["next_after_id"]}
+    ).json()
+    assert second["next_after_id"] is None
+    by_name = {user["name"]: user for user in first["users"] + second["users"]}
+    assert len(by_name) == 7
+
+    assert by_name["Alice"] == {
+        "id": by_name["Alice"]["id"],
+        "name": "Alice",
+        "is_me": False,
+        "is_following": True,
+        "followers_count": 2,
+        "following_count": 2,
+    }
+    assert by_name["Extra 0"]["followers_count"] == 0
+    assert by_name["Extra 0"]["is_following"] is False
+
+    filtered = client.get("/api/users", headers={"api-key": "test"}, params={"q": "al_"}).json()["users"]
+    assert [user["name"] for user in filtered] == ["Al_ias"]
+
+
+def test_follow_lists_are_paginated_and_profiles_carry_counts(client: TestClient, db_session: Session, monkeypatch):
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    fans = [User(name=f"Fan {i}", api_key=f"fan-{i}") for i in range(5)]
+    db_session.add_all(fans)
+    db_session.flush()
+    db_session.add_all([Follow(follower_id=fan.id, followee_id=alice.id) for fan in fans])
+    db_session.commit()
+
+    names = []
+    after_id = None
+    for _ in range(10):
+        params = {"limit": 3} if after_id is None else {"limit": 3, "after_id": after_id}
+        page = client.get(f"/api/users/{alice.id}/followers", headers={"api-key": "test"}, params=params).json()
+        names.extend(user["name"] for user in page["followers"])
+        after_id = page["next_after_id"]
+        if after_id is None:
+            break
+    assert sorted(names) == sorted(["Cool Dev", "Bob"] + [fan.name for fan in fans])
+
+    monkeypatch.setattr(settings, "profile_follow_preview", 2)
+    profile = client.get(f"/api/users/{alice.id}", headers={"api-key": "test"}).json()["user"]
+    assert profile["followers_count"] == 7
+    assert len(profile["followers"]) == 2
+    assert profile["following_count"] == 2
+    assert {user["name"] for user in profile["following"]} == {"Cool Dev", "Bob"}
+
+    assert client.get("/api/users/999999/following", headers={"api-key": "test"}).status_code == 404
+
+
+def test_feed_payload_matches_tweet_schema(client: TestClient):
+    response = client.get("/api/tweets", headers={"api-key": "test"})
+    assert response.headers["content-type"] == "application/json"
+    tweets = response.json()["tweets"]
+    assert tweets
+    for tweet in tweets:
+        assert TweetOut.model_validate(tweet).model_dump(mode="json").keys() == tweet.keys()
+
+
+def test_feed_projection_compiles_json_aggregates_for_postgres():
+    from sqlalchemy.dialects import postgresql
+
+    from app.services.feed import _json_aggregates, _page_query
+
+    sql = str(_json_aggregates(_page_query(1, None, 20, None), 1, 3).compile(dialect=postgresql.dialect()))
+    assert sql.count("json_agg(") == 2
+
+
+def test_feed_embeds_bounded_liker_sample(client: TestClient, db_session: Session, monkeypatch):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    tweet = Tweet(content="popular", author_id=bob.id)
+    fans = [User(name=f"Liker {i}", api_key=f"liker-{i}") for i in range(6)]
+    db_session.add_all([tweet, *fans])
+    db_session.commit()
+    for api_key in [fan.api_key for fan in fans] + ["test"]:
+        assert client.post(f"/api/tweets/{tweet.id}/likes", headers={"api-key": api_key}).status_code == 200
+
+    monkeypatch.setattr(settings, "feed_sample_likers", 2)
+    tweets = {item["id"]: item for item in client.get("/api/tweets", headers={"api-key": "test"}).json()["tweets"]}
+    item = tweets[tweet.id]
+    assert item["like_count"] == 7
+    assert item["liked_by_me"] is True
+    assert [like["name"] for like in item["likes"]] == ["Cool Dev", "Liker 0"]
+
+    names, after_id = [], None
+    for _ in range(10):
+        params = {"limit": 3} if after_id is None else {"limit": 3, "after_id": after_id}
+        page = client.get(f"/api/tweets/{tweet.id}/likes", headers={"api-key": "bob"}, params=params).json()
+        names.extend(like["name"] for like in page["likes"])
+        after_id = page["next_after_id"]
+        if after_id is None:
+            break
+    assert names == [fan.name for fan in fans] + ["Cool Dev"]
+    assert client.get("/api/tweets/999999/likes", headers={"api-key": "test"}).status_code == 404
+
+
+def test_like_and_follow_writes_are_idempotent(client: TestClient, db_session: Session):
+    extra = User(name="Newcomer", api_key="newcomer")
+    db_session.add(extra)
+    db_session.commit()
+
+    messages = [client.post(f"/api/users/{extra.id}/follow", headers={"api-key": "test"}).json()["message"]]
+    messages.append(client.post(f"/api/users/{extra.id}/follow", headers={"api-key": "test"}).json()["message"])
+    messages.append(client.delete(f"/api/users/{extra.id}/follow", headers={"api-key": "test"}).json()["message"])
+    messages.append(client.delete(f"/api/users/{extra.id}/follow", headers={"api-key": "test"}).json()["message"])
+    assert messages == ["followed", "already_following", "unfollowed", "not_following"]
+    assert client.post("/api/users/999999/follow", headers={"api-key": "test"}).status_code == 404
+
+    assert client.post("/api/tweets/999999/likes", headers={"api-key": "test"}).status_code == 404
+    assert client.delete("/api/tweets/999999/likes", headers={"api-key": "test"}).status_code == 200
+
+
+def test_batch_endpoints_report_per_item_results(client: TestClient, db_session: Session, monkeypatch):
+    monkeypatch.setattr(settings, "feed_fanout", "write")
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    me = db_session.query(User).filter(User.api_key == "test").first()
+    extra = User(name="Batch target", api_key="batch-target")
+    db_session.add(extra)
+    db_session.commit()
+
+    created = client.post(
+        "/api/tweets/batch",
+        headers={"api-key": "test"},
+        json={
+            "tweets": [{"tweet_data": "first"}, {"tweet_data": "  "}, {"tweet_data": "third", "tweet_media_ids": [999]}]
+        },
+    ).json()["tweets"]
+    assert created[0]["result"] is True
+    assert created[1] == {"result": False, "error_message": "tweet_data is required"}
+    assert created[2] == {"result": False, "error_message": "invalid media ids"}
+    new_id = created[0]["tweet_id"]
+    assert new_id in _feed_ids(client, "test")
+
+    alice_tweet = db_session.query(Tweet).filter(Tweet.author_id == alice.id).order_by(Tweet.id).first()
+    likes = client.post(
+        "/api/tweets/batch/likes", headers={"api-key": "bob"}, json={"tweet_ids": [new_id, new_id, 999999]}
+    ).json()["likes"]
+    assert [item.get("message") for item in likes] == ["liked", None]
+    again = client.post(
+        "/api/tweets/batch/likes", headers={"api-key": "bob"}, json={"tweet_ids": [new_id, alice_tweet.id]}
+    ).json()["likes"]
+    assert again[0]["message"] == "already_liked"
+    db_session.expire_all()
+    assert db_session.get(Tweet, new_id).like_count == 1
+
+    follows = client.post(
+        "/api/users/batch/follow", headers={"api-key": "test"}, json={"user_ids": [extra.id, alice.id, me.id, 999999]}
+    ).json()["follows"]
+    assert [(item["result"], item.get("message")) for item in follows] == [
+        (True, "followed"),
+        (True, "already_following"),
+        (False, None),
+        (False, None),
+    ]
+    assert client.post("/api/users/batch/follow", headers={"api-key": "test"}, json={"user_ids": []}).status_code == 422
+
+
+def test_deleting_a_tweet_cascades_in_the_database(client: TestClient, db_session: Session):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    tweet = Tweet(content="short-lived", author_id=bob.id)
+    db_session.add(tweet)
+    db_session.commit()
+    tweet_id = tweet.id
+    client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "alice"})
+
+    assert client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "alice"}).status_code == 403
+    assert client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "bob"}).json() == {"result": True}
+    assert client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "bob"}).status_code == 404
+    db_session.expire_all()
+    assert db_session.query(Like).filter(Like.tweet_id == tweet_id).count() == 0
+
+
+def test_admin_purge_removes_account_in_chunks(client: TestClient, db_session: Session, media_dir: Path, monkeypatch):
+    monkeypatch.setattr(settings, "admin_api_keys", ["test"])
+    monkeypatch.setattr(settings, "purge_chunk_size", 2)
+    doomed = User(name="Doomed", api_key="doomed")
+    db_session.add(doomed)
+    db_session.commit()
+    doomed_id = doomed.id
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    alice_tweet = Tweet(content="liked by doomed", author_id=alice.id)
+    db_session.add(alice_tweet)
+    db_session.commit()
+
+    content = b"doomed upload " * 100
+    media_id = client.post(
+        "/api/medias", headers={"api-key": "doomed"}, files={"file": ("d.bin", content, "image/png")}
+    ).json()["media_id"]
+    stored = media_dir / Path(db_session.get(Media, media_id).path).name
+    for i in range(5):
+        client.post("/api/tweets", headers={"api-key": "doomed"}, json={"tweet_data": f"doomed {i}"})
+    client.post(f"/api/tweets/{alice_tweet.id}/likes", headers={"api-key": "doomed"})
+    client.post(f"/api/users/{alice.id}/follow", headers={"api-key": "doomed"})
+    client.post(f"/api/users/{doomed_id}/follow", headers={"api-key": "alice"})
+
+    assert client.delete(f"/api/admin/users/{doomed_id}", headers={"api-key": "bob"}).status_code == 403
+    response = client.delete(f"/api/admin/users/{doomed_id}", headers={"api-key": "test"})
+    assert response.json()["purged"] == {"tweets": 5, "likes": 1, "follows": 2, "medias": 1, "files": 1}
+
+    db_session.expire_all()
+    assert db_session.get(User, doomed_id) is None
+    assert db_session.get(Tweet, alice_tweet.id).like_count == 0
+    assert not stored.exists()
+    assert client.get("/api/users/me", headers={"api-key": "doomed"}).status_code == 401
+    assert client.delete(f"/api/admin/users/{doomed_id}", headers={"api-key": "test"}).status_code == 404
+
+
+def test_endpoints_stay_within_query_budgets(client: TestClient, db_session: Session):
+    users = {user.api_key: user for user in db_session.query(User)}
+    for i in range(10):
+        extra = User(name=f"Extra {i}", api_key=f"extra-{i}")
+        db_session.add(extra)
+        db_session.flush()
+        db_session.add(Follow(follower_id=extra.id, followee_id=users["bob"].id))
+        db_session.add(Follow(follower_id=users["test"].id, followee_id=extra.id))
+        tweet = Tweet(content=f"extra {i}", author_id=extra.id, like_count=3)
+        db_session.add(tweet)
+        db_session.flush()
+        db_session.add_all(Like(user_id=users[key].id, tweet_id=tweet.id) for key in ("test", "alice", "bob"))
+    db_session.commit()
+    tweet_id = tweet.id
+    bob_id = users["bob"].id
+
+    # The first request also resolves the api key; later ones hit the principal cache.
+    budgets = [
+        ("GET", "/api/tweets", None, 4),
+        ("GET", "/api/users", None, 1),
+        ("GET", "/api/users/me", None, 3),
+        ("GET", f"/api/users/{bob_id}", None, 3),
+        ("GET", f"/api/users/{bob_id}/followers", None, 2),
+        ("GET", f"/api/tweets/{tweet_id}/likes", None, 2),
+        ("DELETE", f"/api/tweets/{tweet_id}/likes", None, 2),
+        ("POST", f"/api/tweets/{tweet_id}/likes", None, 2),
+        ("POST", "/api/tweets", {"tweet_data": "budgeted"}, 2),
+    ]
+    for method, path, body, budget in budgets:
+        assert_query_budget(client.request(method, path, headers={"api-key": "test"}, json=body), budget)
+
+
+def _metric(text: str, sample: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_are_labelled_by_route_template(client: TestClient, db_session: Session):
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    tweets = [Tweet(content=f"metered {i}", author_id=alice.id) for i in range(2)]
+    db_session.add_all(tweets)
+    db_session.commit()
+    series = 'http_requests_total{method="GET",route="/api/tweets/{tweet_id}/likes",status="200"}'
+    missing = 'http_requests_total{method="GET",route="/api/tweets/{tweet_id}/likes",status="404"}'
+    before = client.get("/metrics").text
+
+    for tweet in tweets:
+        client.get(f"/api/tweets/{tweet.id}/likes", headers={"api-key": "test"})
+    client.get("/api/tweets/999999/likes", headers={"api-key": "test"})
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    assert _metric(after, series) - _metric(before, series) == 2
+    assert _metric(after, missing) - _metric(before, missing) == 1
+    assert f"/api/tweets/{tweets[0].id}/likes" not in after
+    histogram = 'http_request_duration_seconds_count{method="GET",route="/api/tweets/{tweet_id}/likes"}'
+    assert _metric(after, histogram) - _metric(before, histogram) == 3
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/tweets/{tweet_id}/likes",le="+Inf"}' in after
+    assert "http_requests_in_flight 1" in after  # the scrape itself
+    assert 'db_pool_checked_out{pool="sync"}' in after
+
+
+def test_admin_requested_profile_keeps_collapsed_stacks(client: TestClient, monkeypatch):
+    from app.core.profiler import profile_store
+    from app.deps import auth
+
+    monkeypatch.setattr(settings, "admin_api_keys", ["test"])
+    monkeypatch.setattr(profile_store, "_heap", [])
+    load_principal = auth._load_principal
+
+    def slow_principal_lookup(db, api_key):
+        time.sleep(0.05)
+        return load_principal(db, api_key)
+
+    monkeypatch.setattr(auth, "_load_principal", slow_principal_lookup)
+    client.get("/api/users/me", headers={"api-key": "alice", "x-debug-profile": "1"})  # not an admin: ignored
+    client.get("/api/users/me", headers={"api-key": "test", "x-debug-profile": "1"})
+    profiles = client.get("/api/admin/profiles", headers={"api-key": "test"}).json()["profiles"]
+    assert [(p["route"], p["status"]) for p in profiles] == [("/api/users/me", 200)]
+    assert profiles[0]["duration_ms"] >= 50 and profiles[0]["samples"] > 0
+
+    stacks = client.get(f"/api/admin/profiles/{profiles[0]['id']}", headers={"api-key": "test"}).text
+    worker_stacks = [line for line in stacks.splitlines() if line.startswith("worker;")]
+    assert any("slow_principal_lookup" in line for line in worker_stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks.splitlines())
+    assert client.get("/api/admin/profiles/0", headers={"api-key": "test"}).status_code == 404
+    assert client.get("/api/admin/profiles", headers={"api-key": "alice"}).status_code == 403
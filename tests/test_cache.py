@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.cache import MemoryBackend, RedisBackend, response_cache
+from app.core.config import settings
+from app.models.follow import Follow
+from app.models.tweet import Tweet
+from app.models.user import User
+
+
+class FakeRedis:
+    """The redis-py subset RedisBackend relies on; ``round_trips`` counts the commands a real server would see."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.data[key] = value
+
+    def incr(self, key):
+        self.round_trips += 1
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues ``incr`` calls and sends them in one round trip."""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.keys = []
+
+    def incr(self, key):
+        self.keys.append(key)
+
+    def execute(self):
+        self.client.round_trips += 1
+        data = self.client.data
+        for key in self.keys:
+            data[key] = str(int(data.get(key, 0)) + 1).encode()
+
+
+class LoopGuardRedis(FakeRedis):
+    """Fails any call made from a thread that is running an event loop, i.e. one that would stall every request."""
+
+    def __getattribute__(self, name):
+        if name in ("get", "set", "incr", "pipeline"):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                raise AssertionError(f"blocking redis {name}() on the event loop")
+        return super().__getattribute__(name)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cached_client(request, client: TestClient, monkeypatch):
+    backend = MemoryBackend() if request.param == "memory" else RedisBackend(LoopGuardRedis())
+    monkeypatch.setattr(response_cache, "backend", backend)
+    monkeypatch.setattr(response_cache, "hits", 0)
+    monkeypatch.setattr(response_cache, "misses", 0)
+    return client
+
+
+def _feed(client: TestClient, api_key: str) -> list[dict]:
+    return client.get("/api/tweets", headers={"api-key": api_key}).json()["tweets"]
+
+
+def _feed_ids(client: TestClient, api_key: str) -> list[int]:
+    return [tweet["id"] for tweet in _feed(client, api_key)]
+
+
+def test_feed_is_cached_until_a_write_invalidates_it(cached_client: TestClient, db_session: Session):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    before = _feed_ids(cached_client, "test")
+
+    # A row written behind the API's back is invisible while the page is cached.
+    db_session.add(Tweet(content="sneaky", author_id=bob.id))
+    db_session.commit()
+    assert _feed_ids(cached_client, "test") == before
+
+    created = cached_client.post("/api/tweets", headers={"api-key": "bob"}, json={"tweet_data": "hello followers"})
+    tweet_id = created.json()["tweet_id"]
+    assert tweet_id in _feed_ids(cached_client, "test")
+
+    # A like refreshes the liker's feed at once; other followers may see the old like_count until the TTL.
+    cached_client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "alice"})
+    liked = next(tweet for tweet in _feed(cached_client, "alice") if tweet["id"] == tweet_id)
+    assert (liked["like_count"], liked["liked_by_me"]) == (1, True)
+    assert next(tweet for tweet in _feed(cached_client, "test") if tweet["id"] == tweet_id)["like_count"] == 0
+
+    cached_client.delete(f"/api/tweets/{tweet_id}", headers={"api-key": "bob"})
+    assert tweet_id not in _feed_ids(cached_client, "test")
+
+
+def test_profiles_are_invalidated_by_follows(cached_client: TestClient, db_session: Session, monkeypatch):
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    assert cached_client.get(f"/api/users/{bob.id}", headers={"api-key": "test"}).json()["user"]["followers_count"] == 2
+
+    cached_client.delete(f"/api/users/{bob.id}/follow", headers={"api-key": "test"})
+    profile = cached_client.get(f"/api/users/{bob.id}", headers={"api-key": "test"}).json()["user"]
+    assert profile["followers_count"] == 1
+    me = cached_client.get("/api/users/me", headers={"api-key": "test"}).json()["user"]
+    assert bob.id not in {user["id"] for user in me["following"]}
+
+    monkeypatch.setattr(settings, "admin_api_keys", ["test"])
+    cached_client.get(f"/api/users/{bob.id}", headers={"api-key": "test"})
+    stats = cached_client.get("/api/admin/cache", headers={"api-key": "test"}).json()["cache"]
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 3
+
+
+def test_redis_cache_stays_off_the_event_loop_with_async_sessions(async_client: TestClient, monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", RedisBackend(LoopGuardRedis()))
+    monkeypatch.setattr(response_cache, "hits", 0)
+    headers = {"api-key": "test"}
+    before = _feed_ids(async_client, "test")
+    assert _feed_ids(async_client, "test") == before
+    assert response_cache.hits >= 1
+
+    tweet_id = async_client.post("/api/tweets", headers=headers, json={"tweet_data": "async"}).json()["tweet_id"]
+    assert async_client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "alice"}).status_code == 200
+    assert next(tweet for tweet in _feed(async_client, "alice") if tweet["id"] == tweet_id)["like_count"] == 1
+    me = async_client.get("/api/users/me", headers=headers).json()["user"]
+    assert async_client.delete(f"/api/users/{me['following'][0]['id']}/follow", headers=headers).status_code == 200
+    assert (
+        len(async_client.get("/api/users/me", headers=headers).json()["user"]["following"]) == len(me["following"]) - 1
+    )
+
+
+def test_redis_invalidation_is_one_round_trip_per_write(client: TestClient, db_session: Session, monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(response_cache, "backend", RedisBackend(redis))
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    fans = [User(name=f"fan {i}", api_key=f"fan-{i}") for i in range(50)]
+    db_session.add_all(fans)
+    db_session.flush()
+    db_session.add_all([Follow(follower_id=fan.id, followee_id=bob.id) for fan in fans])
+    db_session.commit()
+
+    redis.round_trips = 0
+    tweet_id = client.post("/api/tweets", headers={"api-key": "bob"}, json={"tweet_data": "hi fans"}).json()["tweet_id"]
+    assert redis.round_trips == 1
+    assert redis.get(f"microblog:gen:feed:{fans[-1].id}") == b"1"
+
+    # Likes only touch the liker's feed, however many followers the author has.
+    redis.round_trips = 0
+    assert client.post(f"/api/tweets/{tweet_id}/likes", headers={"api-key": "fan-0"}).status_code == 200
+    assert redis.round_trips == 1
+    assert redis.get(f"microblog:gen:feed:{fans[-1].id}") == b"1"
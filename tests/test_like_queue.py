@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.like import Like
+from app.models.tweet import Tweet
+from app.models.user import User
+from app.services.like_queue import LikeQueue
+
+
+@pytest.fixture()
+def queue(tmp_path, db_session: Session):
+    return LikeQueue(tmp_path / "likes.log", sessionmaker(bind=db_session.get_bind()), fsync=False)
+
+
+def _likers(db_session: Session, tweet_id: int) -> set[int]:
+    db_session.expire_all()
+    return {row.user_id for row in db_session.query(Like.user_id).filter(Like.tweet_id == tweet_id)}
+
+
+def test_queued_events_coalesce_into_one_flush(queue: LikeQueue, db_session: Session):
+    users = {user.api_key: user.id for user in db_session.query(User)}
+    tweet = Tweet(content="storm", author_id=users["bob"])
+    db_session.add(tweet)
+    db_session.commit()
+
+    queue.submit(users["alice"], tweet.id, True)
+    queue.submit(users["test"], tweet.id, True)
+    queue.submit(users["test"], tweet.id, False)
+    queue.submit(users["test"], tweet.id, True)
+    queue.submit(users["bob"], tweet.id, False)
+    queue.submit(users["alice"], 999999, True)
+    assert queue.stats()["pending"] == 4
+
+    assert queue.flush() == 4
+    assert _likers(db_session, tweet.id) == {users["alice"], users["test"]}
+    assert db_session.get(Tweet, tweet.id).like_count == 2
+    assert not queue.log_path.exists() and not queue.flushing_path.exists()
+
+    queue.submit(users["alice"], tweet.id, False)
+    queue.submit(users["test"], tweet.id, True)
+    queue.flush()
+    assert _likers(db_session, tweet.id) == {users["test"]}
+    assert db_session.get(Tweet, tweet.id).like_count == 1
+    stats = queue.stats()
+    assert (stats["submitted"], stats["applied"], stats["batches"], stats["pending"]) == (8, 6, 2, 0)
+
+
+def test_unflushed_log_is_replayed_on_start(queue: LikeQueue, tmp_path, db_session: Session):
+    alice = db_session.query(User).filter(User.api_key == "alice").first()
+    tweet = Tweet(content="crash", author_id=alice.id)
+    db_session.add(tweet)
+    db_session.commit()
+
+    queue.submit(alice.id, tweet.id, True)
+    restarted = LikeQueue(queue.log_path, queue.session_factory, fsync=False)
+    restarted.start()
+    restarted.stop()
+    assert _likers(db_session, tweet.id) == {alice.id}
+    assert not queue.log_path.exists()
+
+
+def test_write_behind_endpoints_acknowledge_before_applying(
+    client: TestClient, queue: LikeQueue, db_session: Session, monkeypatch
+):
+    monkeypatch.setattr(settings, "like_write_behind", True)
+    monkeypatch.setattr("app.routers.tweets.like_queue", queue)
+    bob = db_session.query(User).filter(User.api_key == "bob").first()
+    tweet = Tweet(content="later", author_id=bob.id)
+    db_session.add(tweet)
+    db_session.commit()
+
+    assert client.post(f"/api/tweets/{tweet.id}/likes", headers={"api-key": "alice"}).status_code == 200
+    assert _likers(db_session, tweet.id) == set()
+    assert client.post("/api/tweets/999999/likes", headers={"api-key": "alice"}).status_code == 404
+    # Unliking is idempotent on both paths, even for a tweet that does not exist.
+    assert client.delete("/api/tweets/999999/likes", headers={"api-key": "alice"}).status_code == 200
+    assert queue.stats()["pending"] == 2
+    queue.flush()
+    assert len(_likers(db_session, tweet.id)) == 1
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+import app.db.base  # noqa: F401
+from app.db.session import Base
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _config() -> Config:
+    config = Config()
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    return config
+
+
+def test_migrations_match_orm_metadata(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'migrations.db'}")
+    config = _config()
+
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+    assert diff == []
+
+
+def test_not_null_migration_drops_association_rows_with_null_keys(tmp_path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'migrations.db'}")
+    config = _config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "0003_timeline_entries")
+        connection.execute(text("INSERT INTO users (id, name, api_key) VALUES (1, 'a', 'a'), (2, 'b', 'b')"))
+        connection.execute(text("INSERT INTO tweets (id, content, author_id) VALUES (1, 'hi', 1)"))
+        connection.execute(text("INSERT INTO follows (follower_id, followee_id) VALUES (1, 2), (1, NULL), (NULL, 2)"))
+        connection.execute(text("INSERT INTO likes (user_id, tweet_id) VALUES (2, 1), (NULL, 1)"))
+        connection.execute(text("INSERT INTO tweet_medias (tweet_id, media_id) VALUES (1, NULL)"))
+        command.upgrade(config, "head")
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT follower_id, followee_id FROM follows")).all() == [(1, 2)]
+        assert connection.execute(text("SELECT user_id, tweet_id FROM likes")).all() == [(2, 1)]
+        assert connection.execute(text("SELECT count(*) FROM tweet_medias")).scalar() == 0
@@ -0,0 +1,41 @@
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.models.follow import Follow
+from app.models.like import Like
+from app.models.tweet import Tweet, TweetMedia
+from app.models.user import User
+from app.seed import generate_dataset
+
+
+def test_generated_dataset_is_consistent(db_session: Session):
+    users_before = db_session.query(User).count()
+    counts = generate_dataset(db_session, users=40, tweets=300, avg_follows=8, avg_likes=4, media_ratio=0.1, seed=7)
+
+    assert counts["users"] == 40 and counts["tweets"] == 300
+    assert db_session.query(User).count() == users_before + 40
+    assert db_session.query(Like).count() >= counts["likes"] > 0
+    assert db_session.query(TweetMedia).count() >= counts["medias"] > 0
+    assert db_session.query(Follow).filter(Follow.follower_id == Follow.followee_id).count() == 0
+
+    actual = db_session.query(func.count(Like.id)).filter(Like.tweet_id == Tweet.id).scalar_subquery()
+    assert db_session.query(Tweet).filter(Tweet.like_count != actual).count() == 0
+
+    # New rows get the next ids, so the ORM keeps inserting after a bulk load with explicit ids.
+    tweet = Tweet(content="after the load", author_id=db_session.query(User.id).first().id)
+    db_session.add(tweet)
+    db_session.commit()
+    assert tweet.id > max(row.id for row in db_session.query(Tweet.id).filter(Tweet.id != tweet.id))
+
+
+def test_likers_follow_the_author_and_sqlite_settings_are_restored(db_session: Session):
+    db_session.execute(text("PRAGMA synchronous=FULL"))
+    generate_dataset(db_session, users=200, tweets=400, avg_follows=20, avg_likes=6, seed=3)
+    assert db_session.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL
+
+    likes = db_session.query(Like.id).join(Tweet, Tweet.id == Like.tweet_id)
+    from_followers = likes.join(
+        Follow, (Follow.follower_id == Like.user_id) & (Follow.followee_id == Tweet.author_id)
+    ).count()
+    # Uniformly drawn likers would follow the author about 10% of the time (20 follows out of 200 users).
+    assert from_followers / likes.count() > 0.5
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.static import IMMUTABLE_CACHE_CONTROL, CachedIndexHtml, CachedStaticFiles, precompress
+
+
+@pytest.fixture()
+def static_client(tmp_path):
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    (assets / "app.ee2cdef2.js").write_text("console.log('bundle');" * 100)
+    (assets / "plain.js").write_text("console.log('plain');")
+    precompress(assets)
+    media = tmp_path / "media"
+    media.mkdir()
+    (media / "clip.bin").write_bytes(bytes(range(256)))
+    (tmp_path / "index.html").write_text("<html>app</html>")
+
+    app = FastAPI()
+    app.mount("/assets", CachedStaticFiles(directory=assets), name="assets")
+    app.mount("/media", CachedStaticFiles(directory=media, precompressed=False, ranges=True), name="media")
+    index_html = CachedIndexHtml(tmp_path / "index.html")
+
+    @app.get("/{full_path:path}")
+    async def spa(full_path: str, request: Request):
+        return index_html.response(request)
+
+    return TestClient(app)
+
+
+def test_hashed_bundle_is_immutable_and_served_precompressed(static_client: TestClient):
+    response = static_client.get("/assets/app.ee2cdef2.js", headers={"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text.startswith("console.log")
+
+    identity = static_client.get("/assets/app.ee2cdef2.js", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert int(identity.headers["content-length"]) > int(response.headers["content-length"])
+
+    plain = static_client.get("/assets/plain.js")
+    assert plain.headers["cache-control"] == "no-cache"
+
+
+def test_media_supports_conditional_and_range_requests(static_client: TestClient):
+    full = static_client.get("/media/clip.bin")
+    assert full.headers["accept-ranges"] == "bytes"
+
+    assert static_client.get("/media/clip.bin", headers={"if-none-match": full.headers["etag"]}).status_code == 304
+
+    partial = static_client.get("/media/clip.bin", headers={"range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == "bytes 10-19/256"
+    assert partial.content == bytes(range(10, 20))
+
+    suffix = static_client.get("/media/clip.bin", headers={"range": "bytes=-6"})
+    assert suffix.content == bytes(range(250, 256))
+
+    stale = static_client.get("/media/clip.bin", headers={"range": "bytes=0-3", "if-range": '"stale"'})
+    assert stale.status_code == 200
+
+    assert static_client.get("/media/clip.bin", headers={"range": "bytes=300-"}).status_code == 416
+
+
+def test_index_html_is_served_from_memory_with_etag(static_client: TestClient):
+    first = static_client.get("/some/deep/link", headers={"accept-encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.text == "<html>app</html>"
+
+    again = static_client.get("/other", headers={"if-none-match": first.headers["etag"]})
+    assert again.status_code == 304